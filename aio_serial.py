@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""asyncio serial transport.
+
+One asyncio event loop runs in a dedicated thread, because Tk owns the
+main thread. Every port's file descriptor is registered with the loop
+through add_reader(), so the read path is exactly the reactor's:
+SerialMultiplexer._service() reads what is waiting and pushes it through
+the channel's framer to its handler.
+
+Writes are non-blocking too. send() writes straight away when the port
+can take the bytes and queues the rest behind add_writer(). It returns an
+asyncio future that is set once the last byte has left. write() is the
+awaitable form with a cancellable timeout.
+
+Bridging to Tk:
+  loop -> Tk   handlers publish engine state into a StateStore that the
+               GuiPump drains on the Tk thread (gui_state.py)
+  Tk -> loop   call() runs a plain callback on the loop and submit()
+               schedules a coroutine. Both are thread-safe and never block
+               the caller.
+
+close() cancels every task, waits for them to finish, closes the loop and
+joins its thread before returning.
+"""
+import asyncio
+import os
+import threading
+from collections import deque
+
+import log
+from serial_mux import SerialMultiplexer
+
+WRITE_TIMEOUT = 2.0
+
+
+class AsyncSerialMultiplexer(SerialMultiplexer):
+    def __init__(self):
+        # No selector or self-pipe; the event loop owns all waiting
+        self.channels = {}
+        self.tap = None
+        self.metrics = None
+        self.arrival_ns = 0
+        self.running = False
+        self.loop = asyncio.new_event_loop()
+        self._thread = None
+
+    # ---- loop thread --------------------------------------------------
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="aio-serial", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop(self):
+        return threading.current_thread() is self._thread
+
+    def call(self, callback, *args):
+        """Run callback(*args) on the loop: now if already there, else next iteration"""
+        if self.in_loop() or not self.running:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit(self, coro):
+        """Schedule a coroutine from any thread; returns a concurrent.futures.Future"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(_report)
+        return future
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result (not from the loop itself)"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self, timeout=1.0):
+        if not self.running:
+            return
+        self.running = False
+        if self._thread and self._thread.is_alive():
+            try:
+                self.run(self._cancel_tasks(), timeout)
+            except Exception as e:
+                log.warning("serial", "event loop shutdown: %r", e)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+        self._thread = None
+
+    async def _cancel_tasks(self):
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self):
+        self.stop()
+        for name in list(self.channels):
+            self.remove(name)
+        self.loop.close()
+
+    # ---- channels -----------------------------------------------------
+
+    def add(self, name, port, handler, on_lost=None):
+        """Register an open serial port; handler(frame) gets each raw frame
+        and on_lost(error) is called on the loop if reading fails"""
+        self.call(self._add, name, port, handler, on_lost)
+
+    def _add(self, name, port, handler, on_lost):
+        super().add_virtual(name, handler)
+        channel = self.channels[name]
+        channel.port = port
+        channel.on_lost = on_lost
+        channel.outbox = deque()
+        channel.writing = False
+        self.loop.add_reader(port.fileno(), self._service, channel)
+
+    def remove(self, name):
+        channel = self.channels.pop(name, None)
+        if channel is None or channel.port is None:
+            return
+        try:
+            fd = channel.port.fileno()
+            self.loop.remove_reader(fd)
+            if channel.writing:
+                self.loop.remove_writer(fd)
+        except (ValueError, OSError, RuntimeError):
+            pass
+        self._fail_outbox(channel, ConnectionError(f"{name} removed"))
+
+    # ---- writes -------------------------------------------------------
+
+    def send(self, name, data):
+        """Queue data for name's port (loop thread only).
+
+        Returns a future that is set once every byte has been written, or
+        fails if the port goes away first.
+        """
+        future = self.loop.create_future()
+        channel = self.channels.get(name)
+        if channel is None or channel.port is None:
+            future.set_exception(ConnectionError(f"{name} is not connected"))
+            return future
+        channel.outbox.append([memoryview(data), future])
+        if len(channel.outbox) == 1:
+            self._flush(channel)
+        return future
+
+    async def write(self, name, data, timeout=WRITE_TIMEOUT):
+        """Write and wait until it's out; a timeout leaves the bytes queued"""
+        await asyncio.wait_for(asyncio.shield(self.send(name, data)), timeout)
+
+    async def drain(self, name, timeout=WRITE_TIMEOUT):
+        """Wait for everything already queued on name to be written"""
+        channel = self.channels.get(name)
+        if channel and channel.port is not None and channel.outbox:
+            await asyncio.wait_for(asyncio.shield(channel.outbox[-1][1]), timeout)
+
+    def _flush(self, channel):
+        fd = channel.port.fileno()
+        outbox = channel.outbox
+        while outbox:
+            entry = outbox[0]
+            try:
+                written = os.write(fd, entry[0])
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                self._fail_outbox(channel, e)
+                break
+            entry[0] = entry[0][written:]
+            if entry[0]:
+                # Port buffer full; finish when it drains
+                if not channel.writing:
+                    self.loop.add_writer(fd, self._flush, channel)
+                    channel.writing = True
+                return
+            outbox.popleft()
+            if not entry[1].done():
+                entry[1].set_result(None)
+        if channel.writing:
+            self.loop.remove_writer(fd)
+            channel.writing = False
+
+    def _fail_outbox(self, channel, error):
+        outbox = getattr(channel, "outbox", None)
+        while outbox:
+            _, future = outbox.popleft()
+            if not future.done():
+                future.set_exception(error)
+
+
+def _report(future):
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        log.error("serial", "async task failed: %r", error)
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""End-to-end latency and throughput benchmarks for the count and alert paths.
+
+Drives a real engine (and, with --gui, the Tk window) through pseudo-
+terminals with synthetic serial input and reports:
+
+    count_throughput   COUNT messages/s sustained through framing + handlers
+    count_latency      COUNT line written -> count shown (count_label in Tk
+                       mode, subscriber notified in headless mode), p50/p99
+    alert_latency      MATCH:TRUE written -> TARGET_REACHED read back on the
+                       LED Nano port, p50/p99
+    cpu / rss          per phase
+
+Results are written as JSON; --compare flags regressions against an
+earlier run:
+
+    python3 bench_e2e.py --output build42.json
+    python3 bench_e2e.py --compare build42.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import select
+import subprocess
+import sys
+import threading
+import time
+import tty
+
+import engine as engine_module
+from engine import AxleCounterEngine, NANO_LED, ROLES, UNO
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize_ms(samples_ns):
+    samples = [s / 1e6 for s in samples_ns]
+    return {
+        "samples": len(samples),
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples) if samples else None,
+    }
+
+
+def current_rss_kb():
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class Phase:
+    """Measures wall time, CPU seconds and RSS across a with-block"""
+
+    def __enter__(self):
+        self.usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.wall = time.perf_counter() - self.start
+        self.cpu = (usage.ru_utime - self.usage.ru_utime) + (usage.ru_stime - self.usage.ru_stime)
+        self.rss_kb = current_rss_kb()
+        self.max_rss_kb = usage.ru_maxrss
+
+    def as_dict(self):
+        return {
+            "wall_s": self.wall,
+            "cpu_s": self.cpu,
+            "cpu_pct": 100.0 * self.cpu / self.wall if self.wall else 0.0,
+            "rss_kb": self.rss_kb,
+            "max_rss_kb": self.max_rss_kb,
+        }
+
+
+class Rig:
+    """Engine wired to three pty pairs; the bench writes to the master side"""
+
+    def __init__(self, gui=False):
+        self.masters = {}
+        self.slaves = []
+        ports = {}
+        for role in ROLES:
+            master, slave = os.openpty()
+            tty.setraw(slave)
+            ports[role] = os.ttyname(slave)
+            self.masters[role] = master
+            self.slaves.append(slave)
+
+        self.gui = gui
+        self.root = None
+        self.app = None
+
+        self.engine = AxleCounterEngine(ports, negotiate_binary=False)
+        self.count_seen = {}
+        self.count_event = threading.Condition()
+        self.engine.subscribe(self._on_changes)
+
+    def _on_changes(self, changes):
+        count = changes.get("axle_count")
+        if count is not None and not self.gui:
+            self._mark_count(count)
+
+    def _mark_count(self, count):
+        now = time.perf_counter_ns()
+        with self.count_event:
+            self.count_seen.setdefault(count, now)
+            self.count_event.notify_all()
+
+    def start(self):
+        if self.gui:
+            import tkinter as tk
+            from railway_display import RailwayAxleCounter
+            self.root = tk.Tk()
+            self.app = RailwayAxleCounter(self.root, self.engine)
+            original = self.app.update_count_display
+
+            def update_count_display():
+                original()
+                # The label now shows the engine's count; record when
+                self.app.count_label.update_idletasks()
+                self._mark_count(self.engine.axle_count)
+
+            self.app.update_count_display = update_count_display
+        else:
+            self.engine.start()
+
+        # pyserial flushes input on open, so wait for all ports first
+        deadline = time.monotonic() + 5
+        while any(self.engine.serial[role] is None for role in ROLES):
+            if time.monotonic() > deadline:
+                raise RuntimeError("engine did not open the bench ports")
+            self._idle(0.01)
+        for role, banner in engine_module.BANNERS.items():
+            os.write(self.masters[role], banner.encode() + b"\r\n")
+        while any(state != "ready" for state in self.engine.device_states.values()):
+            self._idle(0.01)
+
+    def _idle(self, seconds):
+        if self.root:
+            self.root.update()
+        time.sleep(seconds)
+
+    def wait_count(self, count, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        with self.count_event:
+            while count not in self.count_seen:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.count_event.wait(remaining)
+            return self.count_seen[count]
+
+    def reset_counts(self):
+        with self.count_event:
+            self.count_seen.clear()
+
+    def stop(self):
+        if self.app:
+            self.app.on_closing()
+        else:
+            self.engine.stop()
+        for fd in list(self.masters.values()) + self.slaves:
+            os.close(fd)
+
+
+def bench_count_throughput(rig, messages, chunk_lines=64):
+    rig.reset_counts()
+    base = rig.engine.axle_count + 1
+    lines = [b"COUNT:%d\r\n" % (base + i) for i in range(messages)]
+    chunks = [b"".join(lines[i:i + chunk_lines]) for i in range(0, messages, chunk_lines)]
+    last = base + messages - 1
+    master = rig.masters[UNO]
+
+    with Phase() as phase:
+        for chunk in chunks:
+            os.write(master, chunk)
+        done = rig.wait_count(last, timeout=60)
+    if done is None:
+        raise RuntimeError("count throughput run did not complete")
+
+    result = phase.as_dict()
+    result["messages"] = messages
+    result["msgs_per_s"] = messages / phase.wall
+    return result
+
+
+def bench_count_latency(rig, samples, rate):
+    rig.reset_counts()
+    master = rig.masters[UNO]
+    interval = 1.0 / rate
+    base = rig.engine.axle_count + 1
+    latencies = []
+
+    with Phase() as phase:
+        for i in range(samples):
+            count = base + i
+            sent = time.perf_counter_ns()
+            os.write(master, b"COUNT:%d\r\n" % count)
+            shown = rig.wait_count(count, timeout=2.0)
+            if shown is not None:
+                latencies.append(shown - sent)
+            time.sleep(max(0.0, interval - (time.perf_counter_ns() - sent) / 1e9))
+
+    result = summarize_ms(latencies)
+    result["rate_hz"] = rate
+    result.update(phase.as_dict())
+    return result
+
+
+def bench_alert_latency(rig, samples):
+    uno = rig.masters[UNO]
+    led = rig.masters[NANO_LED]
+    latencies = []
+
+    with Phase() as phase:
+        for _ in range(samples):
+            os.write(uno, b"MATCH:FALSE\r\n")
+            deadline = time.monotonic() + 2.0
+            while rig.engine.match_status and time.monotonic() < deadline:
+                time.sleep(0.0005)
+            # Drain anything already queued towards the LED Nano
+            while select.select([led], [], [], 0)[0]:
+                os.read(led, 4096)
+
+            sent = time.perf_counter_ns()
+            os.write(uno, b"MATCH:TRUE\r\n")
+            received = b""
+            deadline = time.monotonic() + 2.0
+            while b"TARGET_REACHED" not in received and time.monotonic() < deadline:
+                if select.select([led], [], [], 0.1)[0]:
+                    received += os.read(led, 4096)
+            if b"TARGET_REACHED" in received:
+                latencies.append(time.perf_counter_ns() - sent)
+
+    result = summarize_ms(latencies)
+    result.update(phase.as_dict())
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def run(args):
+    rig = Rig(gui=args.gui)
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "display": "tk" if args.gui else "headless",
+        }
+    }
+    # The engine logs frames to stdout; keep that off the terminal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        rig.start()
+        try:
+            if rig.root:
+                # Tk must keep running on this thread while the driver waits
+                errors = []
+                driver = threading.Thread(target=run_phases, args=(rig, args, results, errors), daemon=True)
+                driver.start()
+                while driver.is_alive():
+                    rig.root.update()
+                    time.sleep(0.0005)
+                if errors:
+                    raise errors[0]
+            else:
+                run_phases(rig, args, results)
+        finally:
+            rig.stop()
+    return results
+
+
+def run_phases(rig, args, results, errors=None):
+    try:
+        with Phase() as idle:
+            time.sleep(args.idle)
+        results["idle"] = idle.as_dict()
+        results["count_throughput"] = bench_count_throughput(rig, args.messages)
+        results["count_latency"] = bench_count_latency(rig, args.samples, args.rate)
+        results["alert_latency"] = bench_alert_latency(rig, args.alerts)
+    except Exception as e:
+        if errors is None:
+            raise
+        errors.append(e)
+
+
+def report(results):
+    t = results["count_throughput"]
+    c = results["count_latency"]
+    a = results["alert_latency"]
+    print(f"Display          : {results['meta']['display']}")
+    print(f"Idle CPU         : {results['idle']['cpu_pct']:.1f}%")
+    print(f"Count throughput : {t['msgs_per_s']:,.0f} msg/s ({t['messages']} msgs, CPU {t['cpu_pct']:.0f}%, RSS {t['rss_kb']} KB)")
+    print(f"Count latency    : p50 {c['p50_ms']:.3f} ms  p99 {c['p99_ms']:.3f} ms  ({c['samples']} @ {c['rate_hz']} Hz)")
+    print(f"Alert latency    : p50 {a['p50_ms']:.3f} ms  p99 {a['p99_ms']:.3f} ms  ({a['samples']} samples)")
+
+
+# metric path -> True if higher is better
+TRACKED = {
+    ("count_throughput", "msgs_per_s"): True,
+    ("count_latency", "p50_ms"): False,
+    ("count_latency", "p99_ms"): False,
+    ("alert_latency", "p50_ms"): False,
+    ("alert_latency", "p99_ms"): False,
+    ("count_throughput", "cpu_s"): False,
+    ("count_throughput", "rss_kb"): False,
+}
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for (section, key), higher_is_better in TRACKED.items():
+        new = results.get(section, {}).get(key)
+        old = baseline.get(section, {}).get(key)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > tolerance else ""
+        print(f"  {section}.{key:<12} {old:12.3f} -> {new:12.3f}  {change:+7.1%} {flag}")
+        if flag:
+            regressions.append(f"{section}.{key}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end count/alert benchmarks")
+    parser.add_argument("--gui", action="store_true", help="measure up to the Tk count_label (needs a display)")
+    parser.add_argument("--messages", type=int, default=20000, help="COUNT messages for the throughput run")
+    parser.add_argument("--samples", type=int, default=500, help="COUNT latency samples")
+    parser.add_argument("--rate", type=float, default=200.0, help="COUNT rate for the latency run (Hz)")
+    parser.add_argument("--alerts", type=int, default=100, help="MATCH:TRUE -> TARGET_REACHED samples")
+    parser.add_argument("--idle", type=float, default=2.0, help="seconds of idle CPU measurement")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against an earlier results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression (default 0.2)")
+    args = parser.parse_args()
+
+    if args.gui and sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        parser.error("--gui needs a display")
+
+    results = run(args)
+    report(results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline.get('meta', {}).get('revision')}):")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: per-line decode + startswith chain vs byte framing + dispatch table.
+
+Usage: python3 bench_protocol.py [messages] [chunk_bytes]
+"""
+import io
+import sys
+import time
+
+import protocol
+
+
+def make_stream(n):
+    lines = []
+    for i in range(n):
+        kind = i % 8
+        if kind < 5:
+            lines.append(f"COUNT:{i % 100}\r\n")
+        elif kind == 5:
+            lines.append("MATCH:FALSE\r\n")
+        elif kind == 6:
+            lines.append(f"TEMP:{20 + (i % 600) / 10:.2f}\r\n")
+        else:
+            lines.append("LED:OFF\r\n")
+    return "".join(lines).encode()
+
+
+class Sink:
+    def __init__(self):
+        self.count = 0
+        self.match = False
+        self.temperature = 0.0
+        self.led = "OFF"
+
+
+class RawPort(io.RawIOBase):
+    """In-memory stand-in for serial.Serial.
+
+    Like pyserial, it has no peek(), so IOBase.readline() falls back to one
+    read(1) per byte. The real port additionally pays a syscall per byte,
+    which this benchmark does not count.
+    """
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        return self.data.readinto(b)
+
+
+def old_path(stream, sink):
+    """Mirrors the original readline/decode/strip + process_*_message chain"""
+    f = RawPort(stream)
+    while True:
+        raw = f.readline()
+        if not raw:
+            break
+        msg = raw.decode('utf-8', errors='ignore').strip()
+        if not msg:
+            continue
+        if msg.startswith("COUNT:"):
+            sink.count = int(msg.split(":")[1])
+        elif msg.startswith("MATCH:"):
+            sink.match = (msg.split(":")[1] == "TRUE")
+        elif msg == "UNO_READY":
+            pass
+        elif msg.startswith("TEMP:"):
+            sink.temperature = float(msg.split(":")[1])
+        elif msg == "HOT_AXLE_ALERT":
+            pass
+        elif msg == "NANO_READY":
+            pass
+        elif msg.startswith("LED:"):
+            sink.led = msg.split(":")[1]
+        elif msg == "NANO_LED_READY":
+            pass
+
+
+def new_path(stream, sink, chunk):
+    def on_count(v):
+        sink.count = v
+
+    def on_match(v):
+        sink.match = v
+
+    def on_temp(v):
+        sink.temperature = v
+
+    def on_led(v):
+        sink.led = v
+
+    def ignore(_):
+        pass
+
+    dispatcher = protocol.Dispatcher({
+        protocol.COUNT: on_count,
+        protocol.MATCH: on_match,
+        protocol.UNO_READY: ignore,
+        protocol.TEMP: on_temp,
+        protocol.HOT_AXLE_ALERT: ignore,
+        protocol.NANO_READY: ignore,
+        protocol.LED: on_led,
+        protocol.NANO_LED_READY: ignore,
+    })
+    framer = protocol.LineFramer()
+    dispatch = dispatcher.dispatch
+    for start in range(0, len(stream), chunk):
+        for frame in framer.feed(stream[start:start + chunk]):
+            dispatch(frame)
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    chunk = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    stream = make_stream(n)
+
+    a, b = Sink(), Sink()
+    old_path(stream, a)
+    new_path(stream, b, chunk)
+    assert (a.count, a.match, a.temperature, a.led) == (b.count, b.match, b.temperature, b.led)
+
+    old = best_of(lambda: old_path(stream, Sink()))
+    new = best_of(lambda: new_path(stream, Sink(), chunk))
+
+    print(f"{n} messages, {len(stream)} bytes, {chunk}-byte reads")
+    print(f"  readline + decode + startswith : {n / old:12,.0f} msg/s")
+    print(f"  byte framing + dispatch table : {n / new:12,.0f} msg/s")
+    print(f"  speedup                       : {old / new:12.2f}x")
+
+
+if __name__ == "__main__":
+    main()
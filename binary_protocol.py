@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Compact binary framing: COBS + sequence number + CRC-16.
+
+Negotiation: once a device is ready the host sends the text command
+"PROTO:BIN1". Firmware that supports it answers "PROTO:BIN1" as a normal
+text line followed by a 0x00 sync byte, and from then on sends binary
+frames; old firmware ignores the command and keeps talking text.
+Host -> device commands stay text lines.
+
+Frame on the wire: COBS(type, seq, payload..., crc16_lo, crc16_hi) 0x00
+
+    type  u8   packet type (T_* below)
+    seq   u8   per-device counter, wraps at 256
+    crc   u16  CRC-16/CCITT-FALSE over type, seq and payload, little-endian
+"""
+import struct
+
+import protocol
+
+PROTO_REQUEST = b"PROTO:BIN1\n"
+PROTO_ACK = b"PROTO:BIN1"
+
+T_COUNT = 0x01
+T_MATCH = 0x02
+T_TEMP = 0x03
+T_LED = 0x04
+T_HOT_AXLE = 0x05
+T_READY = 0x10
+
+_READY_ROLES = {
+    1: protocol.UNO_READY,
+    2: protocol.NANO_READY,
+    3: protocol.NANO_LED_READY,
+}
+_READY_IDS = {tag: role for role, tag in _READY_ROLES.items()}
+
+_U16 = struct.Struct("<H")
+_I16 = struct.Struct("<h")
+
+
+def _crc16_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+
+_CRC16_TABLE = _crc16_table()
+
+
+def crc16(data, crc=0xFFFF):
+    table = _CRC16_TABLE
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+
+def cobs_encode(data):
+    out = bytearray()
+    for block in bytes(data).split(b"\x00"):
+        # Blocks longer than 254 bytes need a continuation code
+        while len(block) >= 254:
+            out.append(0xFF)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        code = data[i]
+        if code == 0:
+            raise ValueError("zero byte inside COBS frame")
+        end = i + code
+        if end > n:
+            raise ValueError("truncated COBS frame")
+        out += data[i + 1:end]
+        i = end
+        if code < 0xFF and i < n:
+            out.append(0)
+    return bytes(out)
+
+
+def _decode_payload(ptype, payload):
+    if ptype == T_COUNT:
+        return protocol.COUNT, _U16.unpack(payload)[0]
+    if ptype == T_MATCH:
+        return protocol.MATCH, payload[0] != 0
+    if ptype == T_TEMP:
+        return protocol.TEMP, _I16.unpack(payload)[0] / 100.0
+    if ptype == T_LED:
+        return protocol.LED, "ON" if payload[0] else "OFF"
+    if ptype == T_HOT_AXLE:
+        return protocol.HOT_AXLE_ALERT, None
+    if ptype == T_READY:
+        return _READY_ROLES[payload[0]], None
+    raise ValueError(f"unknown packet type {ptype:#x}")
+
+
+def encode_packet(tag, value, seq):
+    """Build one wire frame (including the 0x00 delimiter) for a message"""
+    if tag == protocol.COUNT:
+        body = bytes((T_COUNT, seq & 0xFF)) + _U16.pack(value)
+    elif tag == protocol.MATCH:
+        body = bytes((T_MATCH, seq & 0xFF, 1 if value else 0))
+    elif tag == protocol.TEMP:
+        body = bytes((T_TEMP, seq & 0xFF)) + _I16.pack(round(value * 100))
+    elif tag == protocol.LED:
+        body = bytes((T_LED, seq & 0xFF, 1 if value == "ON" else 0))
+    elif tag == protocol.HOT_AXLE_ALERT:
+        body = bytes((T_HOT_AXLE, seq & 0xFF))
+    elif tag in _READY_IDS:
+        body = bytes((T_READY, seq & 0xFF, _READY_IDS[tag]))
+    else:
+        raise ValueError(f"no binary encoding for {tag}")
+    return cobs_encode(body + _U16.pack(crc16(body))) + b"\x00"
+
+
+class SequenceTracker:
+    """Detects dropped and out-of-order frames from an 8-bit sequence"""
+
+    def __init__(self):
+        self.expected = None
+        self.lost = 0
+        self.stale = 0
+
+    def accept(self, seq):
+        """Return the number of frames skipped before seq, or -1 to drop it"""
+        if self.expected is None:
+            self.expected = (seq + 1) & 0xFF
+            return 0
+        delta = (seq - self.expected) & 0xFF
+        if delta >= 128:
+            # Behind the expected sequence: duplicate or late, already superseded
+            self.stale += 1
+            return -1
+        self.expected = (seq + 1) & 0xFF
+        self.lost += delta
+        return delta
+
+
+class BinaryFramer:
+    """Splits a COBS stream into verified (tag, value) messages.
+
+    Bytes up to the first 0x00 are discarded, so the framer resynchronises
+    after switching over from text mode or after line noise.
+    """
+
+    def __init__(self, on_gap=None):
+        self.buffer = bytearray()
+        self.synced = False
+        self.sequence = SequenceTracker()
+        self.on_gap = on_gap
+        self.corrupt = 0
+
+    def feed(self, data):
+        self.buffer += data
+        end = self.buffer.rfind(b"\x00")
+        if end < 0:
+            return []
+        chunk = bytes(self.buffer[:end])
+        del self.buffer[:end + 1]
+
+        frames = chunk.split(b"\x00")
+        if not self.synced:
+            frames = frames[1:]
+            self.synced = True
+
+        messages = []
+        for frame in frames:
+            if not frame:
+                continue
+            message = self._decode(frame)
+            if message is not None:
+                messages.append(message)
+        return messages
+
+    def _decode(self, frame):
+        try:
+            packet = cobs_decode(frame)
+        except ValueError:
+            self.corrupt += 1
+            return None
+        if len(packet) < 4 or crc16(packet[:-2]) != _U16.unpack(packet[-2:])[0]:
+            self.corrupt += 1
+            return None
+
+        skipped = self.sequence.accept(packet[1])
+        if skipped < 0:
+            return None
+        if skipped and self.on_gap:
+            self.on_gap(skipped)
+
+        try:
+            return _decode_payload(packet[0], packet[2:-2])
+        except (ValueError, KeyError, IndexError, struct.error):
+            self.corrupt += 1
+            return None
+
+    def reset(self):
+        self.buffer.clear()
+        self.synced = False
+        self.sequence = SequenceTracker()
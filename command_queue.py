@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Per-board outbound command queues.
+
+Each board gets its own CommandQueue, so a wedged LED Nano can never
+hold up UNO commands. Everything runs on the serial event loop.
+
+put() never blocks. If nothing is in flight, the commands are written at
+once, in one write. Otherwise they wait in `pending`, where redundant
+commands collapse:
+  - a repeated RESET is dropped
+  - a newer MODE:, TARGET: or LED command replaces the pending one in
+    its original slot, so MODE:COMPARE still goes out before TARGET:n
+  - all pending commands go out together, so MODE:COMPARE + TARGET:n is
+    a single write
+
+A batch that is not written within `timeout` is reported. The bytes stay
+queued in the transport; newer commands collapse behind them.
+
+Boards that echo their state get delivery confirmation. The LED Nano
+answers TARGET_REACHED with LED:ON and RESET with LED:OFF. If the echo
+doesn't arrive in time the command is resent, up to `retries` times,
+unless a newer command for the same thing has already been queued.
+"""
+import asyncio
+
+SEND_TIMEOUT = 2.0
+CONFIRM_TIMEOUT = 1.0
+CONFIRM_RETRIES = 2
+
+# Command -> reply that confirms it, per board role
+CONFIRMATIONS = {
+    "NANO_LED": {
+        "TARGET_REACHED": "ON",
+        "RESET": "OFF",
+    },
+}
+
+
+def command_key(role, command):
+    """Commands with the same key supersede each other while pending"""
+    if role == "NANO_LED" and command in ("TARGET_REACHED", "RESET"):
+        return "led"
+    head, sep, _ = command.partition(":")
+    return head if sep else command
+
+
+class CommandQueue:
+    def __init__(self, role, loop, send, spawn, on_event, timeout=SEND_TIMEOUT,
+                 confirm_timeout=CONFIRM_TIMEOUT, retries=CONFIRM_RETRIES):
+        """send(data) -> future set once written; spawn(coro) runs a task;
+        on_event(kind, detail) reports timeouts and missing confirmations"""
+        self.role = role
+        self.loop = loop
+        self.send = send
+        self.spawn = spawn
+        self.on_event = on_event
+        self.timeout = timeout
+        self.confirm_timeout = confirm_timeout
+        self.retries = retries
+        self.confirmations = CONFIRMATIONS.get(role, {})
+
+        self.pending = {}
+        self.busy = False
+        # (command, expected reply, attempts, timer) awaiting an echo
+        self.awaiting = None
+        self._attempts = {}
+
+        self.sent = 0
+        self.collapsed = 0
+        self.timeouts = 0
+        self.unconfirmed = 0
+
+    def put(self, *commands):
+        """Queue commands (without newline); loop thread only"""
+        for command in commands:
+            self._attempts.pop(command, None)
+            self._enqueue(command)
+        if not self.busy:
+            self._write_pending()
+
+    def _enqueue(self, command):
+        key = command_key(self.role, command)
+        if key in self.pending:
+            self.collapsed += 1
+        self.pending[key] = command
+
+    def _write_pending(self):
+        batch = list(self.pending.values())
+        self.pending.clear()
+        data = "".join(f"{command}\n" for command in batch).encode()
+        # Expect the echo before writing; it can arrive before _complete runs
+        for command in batch:
+            expected = self.confirmations.get(command)
+            if expected:
+                self._expect(command, expected, self._attempts.pop(command, 0))
+        self.busy = True
+        self.spawn(self._complete(batch, self.send(data)))
+
+    async def _complete(self, batch, future):
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.on_event("timeout", f"{' + '.join(batch)} not written after {self.timeout:g}s")
+        except (ConnectionError, OSError) as e:
+            self._unexpect(batch)
+            self.on_event("error", str(e))
+        else:
+            self.sent += len(batch)
+        finally:
+            self.busy = False
+            if self.pending:
+                self._write_pending()
+
+    def _expect(self, command, expected, attempts):
+        if self.awaiting:
+            self.awaiting[3].cancel()
+        timer = self.loop.call_later(self.confirm_timeout, self._confirm_timeout)
+        self.awaiting = (command, expected, attempts, timer)
+
+    def _unexpect(self, batch):
+        if self.awaiting and self.awaiting[0] in batch:
+            self.awaiting[3].cancel()
+            self.awaiting = None
+
+    def _confirm_timeout(self):
+        command, expected, attempts, _ = self.awaiting
+        self.awaiting = None
+        if command_key(self.role, command) in self.pending:
+            return
+        if attempts < self.retries:
+            self._attempts[command] = attempts + 1
+            self._enqueue(command)
+            if not self.busy:
+                self._write_pending()
+            return
+        self.unconfirmed += 1
+        self.on_event("unconfirmed", f"{command} not confirmed after {attempts + 1} attempt(s)")
+
+    def confirm(self, reply):
+        """Feed a state echo from the board; loop thread only"""
+        if self.awaiting and self.awaiting[1] == reply:
+            self.awaiting[3].cancel()
+            self.awaiting = None
+
+    def close(self):
+        """Write whatever is still pending straight away and stop tracking"""
+        if self.pending:
+            batch = list(self.pending.values())
+            self.send("".join(f"{command}\n" for command in batch).encode())
+        self.cancel()
+
+    def cancel(self):
+        if self.awaiting:
+            self.awaiting[3].cancel()
+            self.awaiting = None
+        self.pending.clear()
+        self._attempts.clear()
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""Live browser dashboard over WebSocket.
+
+Any number of browsers on the LAN can watch the count, target, match,
+temperature and LED state without touching the serial ports:
+
+    GET /        the dashboard page (no external scripts or styles)
+    GET /state   current state as JSON
+    GET /ws      WebSocket: {"type": "snapshot", "state": {...}} on connect,
+                 then {"type": "delta", "changes": {...}} with only the
+                 fields that changed
+
+The server runs its own asyncio loop in a daemon thread. Engine
+subscribers only merge the changed fields into a StateStore and wake the
+loop, so the serial path never waits on a browser. Each client has its
+own pending dict: while a slow client is still draining the last message,
+newer changes overwrite older ones there, so a laggy viewer gets fewer,
+fresher deltas and never holds up anyone else. A client is sent at most
+one message per SEND_INTERVAL, and one that stalls for STALL_TIMEOUT is
+dropped.
+
+Only the WebSocket subset a browser needs is implemented: unfragmented
+text frames out, close and ping handled in.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+
+import log
+from defaults import DASHBOARD_PORT as DEFAULT_PORT
+from gui_state import StateStore
+
+SEND_INTERVAL = 0.05
+STALL_TIMEOUT = 30.0
+
+FIELDS = (
+    "axle_count", "target_count", "compare_mode", "match_status",
+    "temperature", "temperature_rate", "rising_alarm", "hot_axle",
+    "led_state", "device_states", "status",
+)
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_TEXT = 0x1
+_OP_CLOSE = 0x8
+_OP_PING = 0x9
+_OP_PONG = 0xA
+
+
+def encode_frame(payload, opcode=_OP_TEXT):
+    """Server frames are never masked"""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack("!BB", 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_frame(reader):
+    """(opcode, payload) of the next client frame"""
+    first, second = await reader.readexactly(2)
+    n = second & 0x7F
+    if n == 126:
+        n = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif n == 127:
+        n = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class _Client:
+    def __init__(self, writer):
+        self.writer = writer
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+
+class DashboardServer:
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        # Bound here so a busy port fails in the caller, like MetricsServer
+        self.sock = socket.create_server((host, port))
+        self.state = StateStore()
+        self.loop = asyncio.new_event_loop()
+        self.clients = set()
+        # Connection handler task -> its writer
+        self._connections = {}
+        self.messages_sent = 0
+        self._server = None
+        self._thread = None
+        self._wake_pending = False
+
+    @property
+    def address(self):
+        return self.sock.getsockname()
+
+    # ---- engine side (any thread) ----------------------------------------
+
+    def on_changes(self, changes):
+        """Engine subscriber: merges the fields and wakes the loop, never blocks"""
+        self._merge({field: changes[field] for field in FIELDS if field in changes})
+
+    def subscriber(self, section):
+        """Like on_changes, but fields are keyed "section/field" """
+        def on_changes(changes):
+            self._merge({f"{section}/{field}": changes[field] for field in FIELDS if field in changes})
+        return on_changes
+
+    def _merge(self, fields):
+        if not fields:
+            return
+        self.state.set(**fields)
+        if not self._wake_pending and self._thread:
+            self._wake_pending = True
+            self.loop.call_soon_threadsafe(self._fan_out)
+
+    # ---- loop thread -----------------------------------------------------
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="dashboard", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._listen(), self.loop).result()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _listen(self):
+        self._server = await asyncio.start_server(self._handle, sock=self.sock)
+
+    def stop(self, timeout=1.0):
+        if not self._thread:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+        self.loop.close()
+
+    async def _close(self):
+        self._server.close()
+        # Closing the transports ends every handler through its own error path
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=0.5)
+
+    def _fan_out(self):
+        self._wake_pending = False
+        changes = self.state.take_changes()
+        if not changes:
+            return
+        for client in self.clients:
+            client.pending.update(changes)
+            client.ready.set()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            await self._serve(reader, writer)
+        finally:
+            del self._connections[task]
+            writer.close()
+
+    async def _serve(self, reader, writer):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+            return
+        request, *lines = head.decode("latin-1").split("\r\n")
+        parts = request.split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else ""
+        headers = {}
+        for line in lines:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+
+        try:
+            if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._websocket(reader, writer, headers)
+            elif path == "/":
+                await self._respond(writer, 200, "text/html; charset=utf-8", PAGE.encode())
+            elif path == "/state":
+                body = json.dumps(self.state.snapshot()).encode()
+                await self._respond(writer, 200, "application/json", body)
+            else:
+                await self._respond(writer, 404, "text/plain", b"not found\n")
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+
+    async def _respond(self, writer, status, content_type, body):
+        reason = "OK" if status == 200 else "Not Found"
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nCache-Control: no-store\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+
+    async def _websocket(self, reader, writer, headers):
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode())
+
+        client = _Client(writer)
+        self.clients.add(client)
+        peer = writer.get_extra_info("peername")
+        log.info("dashboard", "client %s connected (%d watching)", peer, len(self.clients))
+        sender = asyncio.ensure_future(self._send_loop(client))
+        try:
+            while not sender.done():
+                receive = asyncio.ensure_future(read_frame(reader))
+                done, _ = await asyncio.wait({receive, sender}, return_when=asyncio.FIRST_COMPLETED)
+                if receive not in done:
+                    receive.cancel()
+                    break
+                opcode, payload = receive.result()
+                if opcode == _OP_CLOSE:
+                    writer.write(encode_frame(payload[:2], _OP_CLOSE))
+                    break
+                if opcode == _OP_PING:
+                    writer.write(encode_frame(payload, _OP_PONG))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(client)
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+            log.info("dashboard", "client %s left (%d watching)", peer, len(self.clients))
+
+    async def _send_loop(self, client):
+        # Registered before the snapshot is taken, so nothing falls in between
+        await self._send(client, {"type": "snapshot", "state": self.state.snapshot()})
+        while True:
+            await client.ready.wait()
+            client.ready.clear()
+            changes, client.pending = client.pending, {}
+            await self._send(client, {"type": "delta", "changes": changes})
+            await asyncio.sleep(SEND_INTERVAL)
+
+    async def _send(self, client, message):
+        client.writer.write(encode_frame(json.dumps(message, default=str).encode()))
+        await asyncio.wait_for(client.writer.drain(), STALL_TIMEOUT)
+        self.messages_sent += 1
+
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width">
+<title>Railway Axle Counter</title>
+<style>
+body { background: #1a1a2e; color: #fff; font-family: Arial, sans-serif; margin: 12px; }
+#sections { display: flex; flex-wrap: wrap; gap: 12px; }
+.card { background: #16213e; border-radius: 6px; padding: 10px 16px; min-width: 220px; }
+.card.match { background: #1f4d2b; }
+.name { font-weight: bold; color: #aaa; }
+.count { font: bold 64px Courier, monospace; color: #0f0; }
+.count.under { color: #fa0; } .count.over { color: #f00; }
+.row { color: #aaa; margin: 2px 0; }
+.alarm { color: #f60; font-weight: bold; }
+#link { font-size: 12px; color: #888; }
+</style></head><body>
+<div id="link">connecting...</div>
+<div id="sections"></div>
+<script>
+const state = {};
+function section(key) { const i = key.lastIndexOf("/"); return i < 0 ? ["", key] : [key.slice(0, i), key.slice(i + 1)]; }
+function render() {
+  const groups = {};
+  for (const [key, value] of Object.entries(state)) {
+    const [name, field] = section(key);
+    (groups[name] = groups[name] || {})[field] = value;
+  }
+  const root = document.getElementById("sections");
+  for (const [name, s] of Object.entries(groups)) {
+    let card = document.getElementById("s-" + name);
+    if (!card) {
+      card = document.createElement("div");
+      card.id = "s-" + name;
+      card.className = "card";
+      card.innerHTML = '<div class="name"></div><div class="count"></div><div class="row mode"></div>' +
+        '<div class="row temp"></div><div class="row led"></div><div class="row devices"></div><div class="row status"></div>';
+      card.querySelector(".name").textContent = name || "Axle counter";
+      root.appendChild(card);
+    }
+    const count = s.axle_count || 0, target = s.target_count || 0;
+    const el = card.querySelector(".count");
+    el.textContent = count;
+    el.className = "count" + (s.compare_mode && target ? (count === target ? "" : count > target ? " over" : " under") : "");
+    card.className = "card" + (s.match_status ? " match" : "");
+    card.querySelector(".mode").textContent = s.compare_mode && target ? "target " + target : "COUNT mode";
+    const t = card.querySelector(".temp");
+    t.textContent = typeof s.temperature === "number" && s.temperature > -50
+      ? s.temperature.toFixed(1) + " °C" + (s.temperature_rate ? " (" + s.temperature_rate.toFixed(1) + " °C/min)" : "") : "-- °C";
+    t.className = "row temp" + (s.rising_alarm || s.hot_axle ? " alarm" : "");
+    card.querySelector(".led").textContent = "LED " + (s.led_state || "?");
+    card.querySelector(".devices").textContent = Object.entries(s.device_states || {}).map(([r, v]) => r + ": " + v).join("  ");
+    card.querySelector(".status").textContent = s.status || "";
+  }
+}
+let pending = false;
+function schedule() { if (!pending) { pending = true; requestAnimationFrame(() => { pending = false; render(); }); } }
+function connect() {
+  const ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+  const link = document.getElementById("link");
+  ws.onopen = () => { link.textContent = "live"; };
+  ws.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    if (message.type === "snapshot") { for (const key in state) delete state[key]; Object.assign(state, message.state); }
+    else Object.assign(state, message.changes);
+    schedule();
+  };
+  ws.onclose = () => { link.textContent = "disconnected - retrying"; setTimeout(connect, 1000); };
+}
+connect();
+</script></body></html>
+"""
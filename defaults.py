@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""Default ports, paths and names shared by the front ends and services.
+
+Kept free of imports so the window can build its command line without
+loading the subsystems behind each option.
+"""
+import os
+
+DASHBOARD_PORT = 8088
+METRICS_PORT = 9108
+EVENTS_PATH = os.environ.get("ADLD_EVENTS", os.path.expanduser("~/.local/share/adld_elb/events.db"))
+SHARED_STATE_NAME = "adld_state"
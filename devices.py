@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Concurrent Arduino connection with READY-banner handshake.
+
+Every port is opened by its own task on the serial event loop; the
+blocking open itself runs in the loop's default executor so a slow
+driver never stalls traffic on the ports already up. A device
+counts as ready when its banner arrives or when its ready timeout expires
+(a board that did not reset on open never prints the banner again); the
+wait is an asyncio timeout, so cancel() stops every pending handshake at
+once.
+
+A port that cannot be opened, or that drops out later (reconnect()), is
+retried with exponential backoff from RETRY_MIN up to RETRY_MAX, so a
+board is picked up again well within a second of being plugged back in.
+A board that has never been ready and whose device node doesn't exist
+(not plugged in at startup) is reported "absent" and polled only every
+ABSENT_RETRY_MAX seconds.
+"""
+import asyncio
+import functools
+import os
+
+import serial
+
+BAUDRATE = 115200
+RETRY_MIN = 0.05
+RETRY_MAX = 0.4
+ABSENT_RETRY_MAX = 5.0
+
+CONNECTING = "connecting"
+WAITING = "waiting"
+READY = "ready"
+FAILED = "failed"
+LOST = "lost"
+ABSENT = "absent"
+
+
+class DeviceSpec:
+    def __init__(self, name, port, banner, ready_timeout=3.0, baudrate=BAUDRATE):
+        self.name = name
+        self.port = port
+        self.banner = banner
+        self.ready_timeout = ready_timeout
+        self.baudrate = baudrate
+
+
+class DeviceConnector:
+    def __init__(self, specs, on_open, on_state, loop):
+        """on_open(name, serial) runs as soon as a port is open;
+        on_state(name, state, detail) reports every state transition.
+        Both are called on loop's thread."""
+        self.specs = {spec.name: spec for spec in specs}
+        self.on_open = on_open
+        self.on_state = on_state
+        self.loop = loop
+        self.states = {spec.name: CONNECTING for spec in specs}
+        self._banners = {}
+        self._tasks = {}
+        # Roles that have been ready at least once
+        self._ready_once = set()
+
+    def start(self):
+        """Start every handshake; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self._start)
+
+    def _start(self):
+        for spec in self.specs.values():
+            self._banners[spec.name] = asyncio.Event()
+            self.on_state(spec.name, CONNECTING, spec.port)
+            self._tasks[spec.name] = self.loop.create_task(self._connect(spec))
+
+    async def _connect(self, spec):
+        delay = RETRY_MIN
+        while True:
+            opening = self.loop.run_in_executor(None, functools.partial(serial.Serial, spec.port, spec.baudrate, timeout=1))
+            try:
+                port = await asyncio.shield(opening)
+                break
+            except asyncio.CancelledError:
+                # The open carries on in its thread; don't leak the port
+                opening.add_done_callback(_close_opened)
+                raise
+            except Exception as e:
+                if spec.name not in self._ready_once and not os.path.exists(spec.port):
+                    # Never plugged in: say so once and poll slowly
+                    if self.states[spec.name] != ABSENT:
+                        self._set_state(spec.name, ABSENT, spec.port)
+                    limit = ABSENT_RETRY_MAX
+                else:
+                    # Report the first failure only; keep retrying quietly
+                    if self.states[spec.name] not in (FAILED, LOST):
+                        self._set_state(spec.name, FAILED, str(e))
+                    limit = RETRY_MAX
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, limit)
+
+        self._set_state(spec.name, WAITING, spec.port)
+        self.on_open(spec.name, port)
+        try:
+            await asyncio.wait_for(self._banners[spec.name].wait(), spec.ready_timeout)
+            detail = "banner"
+        except asyncio.TimeoutError:
+            detail = "timeout, no banner"
+        self._ready_once.add(spec.name)
+        self._set_state(spec.name, READY, detail)
+
+    def reconnect(self, name, detail=""):
+        """Start reopening a port that went away (loop thread only)"""
+        spec = self.specs[name]
+        task = self._tasks.get(name)
+        if task:
+            task.cancel()
+        self._banners[name] = asyncio.Event()
+        self._set_state(name, LOST, detail)
+        self._tasks[name] = self.loop.create_task(self._connect(spec))
+
+    def banner_seen(self, name):
+        self.loop.call_soon_threadsafe(self._banner_seen, name)
+
+    def _banner_seen(self, name):
+        event = self._banners.get(name)
+        if event:
+            event.set()
+
+    def is_ready(self, name):
+        return self.states.get(name) == READY
+
+    def cancel(self):
+        """Cancel pending handshakes; safe to call from any thread"""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.cancel_now)
+
+    def cancel_now(self):
+        """cancel() for code already running on the loop"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    def _set_state(self, name, state, detail):
+        self.states[name] = state
+        self.on_state(name, state, detail)
+
+
+def _close_opened(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
@@ -0,0 +1,723 @@
+#!/usr/bin/env python3
+"""UI-free axle counter engine.
+
+Owns the serial devices, the protocol handling, the count/target/match
+state and the LED alert logic. Front ends (the Tk window, the headless
+runner) subscribe to state changes instead of reaching into the engine.
+
+All serial I/O, handshakes and protocol timeouts run as callbacks and
+tasks on one asyncio loop (aio_serial.py). Subscribers are called as
+callback(changes) with a dict of the fields that changed, usually from
+that loop's thread, so they must be thread-safe and quick (e.g.
+StateStore.set). Commands (set_compare_mode, reset_count, ...) may be
+called from any thread; they only queue writes on the loop.
+
+A board whose port fails is closed and reopened with backoff
+(devices.py). Once it is ready again it is re-synced (MODE/TARGET and
+STATUS for the UNO, the LED state for the LED Nano) and the outage is
+published as an "outage" change, so counts taken across it can be
+flagged.
+"""
+import asyncio
+import signal
+import threading
+import time
+
+from aio_serial import WRITE_TIMEOUT, AsyncSerialMultiplexer
+
+from binary_protocol import PROTO_ACK, PROTO_REQUEST, BinaryFramer
+from command_queue import CommandQueue
+from devices import DeviceConnector, DeviceSpec
+from metrics import Metrics, MetricsServer, render_prometheus
+from port_discovery import discover
+import log
+import protocol
+from temperature_history import TemperatureHistory
+
+UNO = "UNO"
+NANO_TEMP = "NANO_TEMP"
+NANO_LED = "NANO_LED"
+ROLES = (UNO, NANO_TEMP, NANO_LED)
+
+BANNERS = {
+    UNO: "UNO_READY",
+    NANO_TEMP: "NANO_READY",
+    NANO_LED: "NANO_LED_READY",
+}
+
+# Used for any role discovery can't identify
+# UNO typically: /dev/ttyACM0
+# Nano #1 (Temp): /dev/ttyUSB0
+# Nano #2 (LED): /dev/ttyUSB1
+DEFAULT_PORTS = {
+    UNO: '/dev/ttyACM0',
+    NANO_TEMP: '/dev/ttyUSB0',
+    NANO_LED: '/dev/ttyUSB1',
+}
+
+# Ask each board to switch to COBS/CRC binary frames once it is ready;
+# firmware without support ignores the request and stays on text lines
+NEGOTIATE_BINARY = True
+BINARY_ACK_TIMEOUT = 2.0
+
+# Early hot-axle warning: a bearing heating this fast (°C/min, least-squares
+# over TemperatureHistory's window) is flagged before it reaches 80 °C.
+# The warning clears once the rise drops below half the threshold.
+RATE_OF_RISE_ALARM = 10.0
+RATE_OF_RISE_MIN_SPAN = 10.0
+RATE_OF_RISE_MIN_TEMP = 40.0
+# Readings at or below this mean the sensor is missing (DS18B20 sends -127)
+NO_SENSOR = -50
+# Points in the published temperature_view sparkline
+TEMPERATURE_VIEW_POINTS = 80
+# The UNO keeps count and target in a 16-bit int
+MAX_TARGET = 32767
+
+
+class AxleCounterEngine:
+    def __init__(self, ports=None, negotiate_binary=NEGOTIATE_BINARY, section=None,
+                 serial_mux=None, metrics=None, discover_missing=True):
+        """ports: optional {role: device path}; missing roles are auto-discovered
+        unless discover_missing is False, in which case they stay absent.
+
+        Several engines (one per track section) can share one serial_mux
+        and metrics; section then namespaces their reactor channels.
+        """
+        self.ports = dict(ports or {})
+        self.negotiate_binary = negotiate_binary
+        self.section = section
+        self.discover_missing = discover_missing
+        # Reactor channel / log name per role, e.g. "North/UNO"
+        self.names = {role: f"{section}/{role}" if section else role for role in ROLES}
+
+        # State
+        self.axle_count = 0
+        self.target_count = 0
+        self.temperature = 0.0
+        self.compare_mode = False
+        self.match_status = False
+        self.hot_axle = False
+        self.led_state = "OFF"
+        self.temperature_history = TemperatureHistory()
+        self.temperature_rate = 0.0
+        self.rising_alarm = False
+        # Immutable TemperatureView of the history; the history itself is
+        # only ever touched on the loop thread
+        self.temperature_view = None
+
+        # Serial ports
+        self.serial = {role: None for role in ROLES}
+        self.device_states = {role: "discovering" for role in ROLES}
+        self.link_modes = {role: "text" for role in ROLES}
+        self.link_gaps = {role: 0 for role in ROLES}
+        self.bytes_out = {role: 0 for role in ROLES}
+        self.opens = {role: 0 for role in ROLES}
+        # Start time of the current outage per role, None while connected
+        self.outage_started = {role: None for role in ROLES}
+        self.outage_count = 0
+        self.outages = {role: 0 for role in ROLES}
+        self.outage_seconds = {role: 0.0 for role in ROLES}
+        # A board that never came up has no outage to report, only a late start
+        self.connected_once = set()
+
+        self._subscribers = []
+        self.recorder = None
+        self.event_store = None
+        self.metrics_server = None
+        self.dashboard = None
+        self.shared_state = None
+        self.connector = None
+        self.running = False
+        self.owns_mux = serial_mux is None
+        self.serial_mux = serial_mux or AsyncSerialMultiplexer()
+        self.loop = self.serial_mux.loop
+        self._binary_acks = {}
+        self._tasks = set()
+        self.command_queues = {role: self._command_queue(role) for role in ROLES}
+        self.metrics = metrics or Metrics()
+        if self.owns_mux:
+            self.serial_mux.metrics = self.metrics
+        # Arrival time of the bytes that carried the current axle_count
+        self.count_arrival_ns = 0
+        # Arrival time of the MATCH:TRUE whose TARGET_REACHED is being written
+        self.alert_arrival_ns = 0
+        self.setup_dispatchers()
+
+    # ---- subscription -------------------------------------------------
+
+    def subscribe(self, callback):
+        """Register callback(changes); it is sent a full snapshot straight away"""
+        self._subscribers.append(callback)
+        callback(self.snapshot())
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def snapshot(self):
+        return {
+            "axle_count": self.axle_count,
+            "target_count": self.target_count,
+            "temperature": self.temperature,
+            "compare_mode": self.compare_mode,
+            "match_status": self.match_status,
+            "hot_axle": self.hot_axle,
+            "temperature_rate": self.temperature_rate,
+            "rising_alarm": self.rising_alarm,
+            "temperature_view": self.temperature_view,
+            "led_state": self.led_state,
+            "device_states": dict(self.device_states),
+        }
+
+    def publish(self, **changes):
+        for callback in list(self._subscribers):
+            try:
+                callback(changes)
+            except Exception as e:
+                log.error("engine", "subscriber error: %r", e)
+
+    def set_status(self, message):
+        self.publish(status=message)
+
+    def port_counters(self):
+        """{role: {counter: value}} gathered from the reactor and dispatchers"""
+        counters = {}
+        for role in ROLES:
+            channel = self.serial_mux.channels.get(self.names[role])
+            dispatcher = self.dispatchers[role]
+            counters[role] = {
+                "bytes_in": channel.bytes_in if channel else 0,
+                "bytes_out": self.bytes_out[role],
+                "messages": channel.frames_in if channel else 0,
+                "parse_errors": dispatcher.errors + (getattr(channel.framer, "corrupt", 0) if channel else 0),
+                "unknown": dispatcher.unknown,
+                "frames_lost": self.link_gaps[role],
+                "reconnects": max(0, self.opens[role] - 1),
+                "outages": self.outages[role],
+                "outage_seconds": self.outage_seconds[role],
+                "commands_collapsed": self.command_queues[role].collapsed,
+                "send_timeouts": self.command_queues[role].timeouts,
+                "unconfirmed": self.command_queues[role].unconfirmed,
+            }
+        return counters
+
+    # ---- lifecycle ----------------------------------------------------
+
+    def start(self):
+        """Start the event loop and connect to the boards in the background"""
+        self.running = True
+        if self.owns_mux:
+            self.serial_mux.start()
+        self.serial_mux.call(self.spawn, self._discover_and_connect())
+
+    def _command_queue(self, role):
+        def send(data):
+            if self.recorder:
+                self.recorder.outbound(self.names[role], data)
+            return self._send(role, data)
+
+        return CommandQueue(role, self.loop, send, self.spawn, lambda kind, detail: self.on_command_event(role, kind, detail))
+
+    def spawn(self, coro):
+        """Run coro as a task owned by this engine (loop thread only)"""
+        task = self.loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("engine", "task failed: %r", task.exception())
+
+    def stop(self, timeout=2.0):
+        """Flush queued writes, cancel handshakes and close every port, then
+        stop the loop if this engine owns it. Returns once all of it is done."""
+        if self.running and self.serial_mux.running:
+            try:
+                self.serial_mux.run(self._shutdown(), timeout)
+            except Exception as e:
+                log.warning("engine", "shutdown incomplete: %r", e)
+        self.running = False
+        if self.owns_mux:
+            self.serial_mux.close()
+        for role in ROLES:
+            if self.serial[role]:
+                self.serial[role].close()
+                self.serial[role] = None
+        # A shared multiplexer's recorder belongs to its owner (SectionManager)
+        if self.recorder and self.owns_mux:
+            self.recorder.close()
+        if self.event_store:
+            self.unsubscribe(self.event_store.on_changes)
+            self.event_store.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.dashboard:
+            self.unsubscribe(self.dashboard.on_changes)
+            self.dashboard.stop()
+        if self.shared_state:
+            self.unsubscribe(self.shared_state.on_changes)
+            self.shared_state.close()
+
+    def record_to(self, path):
+        """Capture all inbound and outbound serial bytes into a traffic log"""
+        from traffic_log import TrafficRecorder
+
+        self.recorder = TrafficRecorder(path)
+        self.serial_mux.tap = self.recorder.inbound
+
+    def store_events(self, path):
+        """Persist every state change to an SQLite event store"""
+        from event_store import EventStore
+
+        self.event_store = EventStore(path)
+        self.subscribe(self.event_store.on_changes)
+
+    def serve_metrics(self, port):
+        """Expose counters and latency histograms at http://127.0.0.1:port/metrics"""
+        try:
+            self.metrics_server = MetricsServer(lambda: render_prometheus([self], self.event_store), port)
+        except OSError as e:
+            log.warning("metrics", "endpoint unavailable on port %d: %s", port, e)
+            return
+        self.metrics_server.start()
+        log.info("metrics", "serving http://127.0.0.1:%d/metrics", port)
+
+    def serve_dashboard(self, port, host="0.0.0.0"):
+        """Stream state to browsers at http://host:port/"""
+        from dashboard import DashboardServer
+
+        try:
+            self.dashboard = DashboardServer(port, host)
+        except OSError as e:
+            log.warning("dashboard", "unavailable on port %d: %s", port, e)
+            return
+        self.dashboard.start()
+        self.subscribe(self.dashboard.on_changes)
+        log.info("dashboard", "serving http://%s:%d/", host, port)
+
+    def share_state(self, name):
+        """Mirror state into shared memory segment name for local readers (shared_state.py)"""
+        from shared_state import SharedStateWriter
+
+        try:
+            self.shared_state = SharedStateWriter(name)
+        except OSError as e:
+            log.warning("shared_state", "not publishing %s: %s", name, e)
+            return
+        self.serial_mux.call(self.loop.add_reader, self.shared_state.listener.fileno(), self.shared_state.accept)
+        self.subscribe(self.shared_state.on_changes)
+        log.info("shared_state", "publishing /dev/shm/%s", name)
+
+    async def _shutdown(self):
+        self.running = False
+        if self.shared_state:
+            self.loop.remove_reader(self.shared_state.listener.fileno())
+        if self.connector:
+            self.connector.cancel_now()
+        for queue in self.command_queues.values():
+            queue.close()
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Let commands already queued (e.g. RESET to the LED Nano) go out
+        for role in ROLES:
+            try:
+                await self.serial_mux.drain(self.names[role], timeout=0.5)
+            except (asyncio.TimeoutError, ConnectionError, OSError):
+                pass
+            self.serial_mux.remove(self.names[role])
+
+    async def _discover_and_connect(self):
+        if not self.discover_missing:
+            ports = self.ports
+            for role in ROLES:
+                if role not in ports:
+                    self.device_states[role] = "absent"
+            self.publish(device_states=dict(self.device_states))
+        else:
+            ports = dict(DEFAULT_PORTS)
+            ports.update(self.ports)
+
+        if self.discover_missing and any(role not in self.ports for role in ROLES):
+            try:
+                missing = [role for role in ROLES if role not in self.ports]
+                # Probing blocks for seconds, so it runs off the loop
+                found = await self.loop.run_in_executor(None, discover, missing)
+                ports.update(found)
+                log.info("device", "discovered ports: %s", found)
+            except Exception as e:
+                log.warning("device", "port discovery failed: %s", e)
+
+        self.connector = DeviceConnector(
+            [DeviceSpec(role, ports[role], BANNERS[role]) for role in ROLES if role in ports],
+            on_open=self.on_device_open,
+            on_state=self.on_device_state,
+            loop=self.loop,
+        )
+        if self.running:
+            self.connector.start()
+
+    def on_device_open(self, name, port):
+        """Called on the loop as soon as a port is open"""
+        self.serial[name] = port
+        self.opens[name] += 1
+        # A reopened board has reset to text framing
+        self.link_modes[name] = "text"
+        self.serial_mux.add(self.names[name], port, self.line_handlers[name],
+                            lambda error: self.on_device_lost(name, error))
+
+    def on_device_lost(self, name, error):
+        """Called on the loop when a port fails mid-run; starts reconnecting"""
+        port, self.serial[name] = self.serial[name], None
+        if port:
+            try:
+                port.close()
+            except Exception:
+                pass
+        self.command_queues[name].cancel()
+        if not self.running or not self.connector:
+            return
+        self._begin_outage(name)
+        self.set_status(f"⚠ {name} disconnected - reconnecting")
+        self.connector.reconnect(name, str(error))
+
+    def on_device_state(self, name, state, detail):
+        log.info("device", "%s: %s (%s)", self.names[name], state, detail)
+        self.device_states[name] = state
+        self.publish(device_states=dict(self.device_states))
+        if state == "failed":
+            self._begin_outage(name)
+            self.set_status(f"✗ {name} connection failed: {detail} - retrying")
+        elif state == "absent":
+            self.set_status(f"{name} not plugged in ({detail}) - waiting for it")
+        elif state == "ready":
+            self.connected_once.add(name)
+            self.set_status(f"✓ {name} ready")
+            if self.negotiate_binary:
+                self.request_binary(name)
+            if self.outage_started[name] is not None:
+                self._end_outage(name)
+                self.resync(name)
+
+    def _begin_outage(self, name):
+        if name in self.connected_once and self.outage_started[name] is None:
+            self.outage_started[name] = time.time()
+            if name == UNO:
+                self.outage_count = self.axle_count
+
+    def _end_outage(self, name):
+        started, self.outage_started[name] = self.outage_started[name], None
+        seconds = time.time() - started
+        self.outages[name] += 1
+        self.outage_seconds[name] += seconds
+        outage = {"role": name, "start": round(started, 3), "seconds": round(seconds, 3)}
+        if name == UNO:
+            # Axles passing while the UNO was away (or reset) were not counted
+            outage["count_before"] = self.outage_count
+            status = f"⚠ UNO was offline {seconds:.1f}s - axles may have been missed"
+        else:
+            status = f"✓ {name} back after {seconds:.1f}s"
+        log.warning("device", "%s: outage of %.1fs", self.names[name], seconds)
+        self.publish(outage=outage, status=status)
+
+    def resync(self, name):
+        """Bring a board that came back in line with the engine's state"""
+        if name == UNO:
+            if self.compare_mode:
+                self.send_command(UNO, "MODE:COMPARE", f"TARGET:{self.target_count}", "STATUS")
+            else:
+                self.send_command(UNO, "MODE:COUNT", "STATUS")
+        elif name == NANO_LED:
+            self.send_command(NANO_LED, "TARGET_REACHED" if self.match_status else "RESET")
+        else:
+            self.send_command(name, "STATUS")
+
+    def request_binary(self, name):
+        self.serial_mux.call(self.spawn, self._negotiate_binary(name))
+
+    async def _negotiate_binary(self, name):
+        if not self.serial[name]:
+            return
+
+        channel = self.names[name]
+        self.expect_binary(name)
+        ack = self._binary_acks[name] = asyncio.Event()
+        try:
+            await self.write_async(name, PROTO_REQUEST)
+            await asyncio.wait_for(ack.wait(), BINARY_ACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Old firmware never answers; stop scanning for the ack
+            self.serial_mux.cancel_upgrade(channel)
+        except (ConnectionError, OSError) as e:
+            self.serial_mux.cancel_upgrade(channel)
+            log.warning("link", "%s protocol request failed: %s", channel, e)
+        finally:
+            self._binary_acks.pop(name, None)
+
+    def expect_binary(self, name):
+        """Arm the reactor to switch name to binary frames when the ack arrives"""
+        dispatcher = self.dispatchers[name]
+        framer = BinaryFramer(on_gap=lambda lost: self.on_link_gap(name, lost))
+        self.serial_mux.request_upgrade(self.names[name], PROTO_ACK, framer, lambda msg: dispatcher.deliver(*msg))
+
+    def on_proto_ack(self, name, version):
+        self.link_modes[name] = "binary"
+        ack = self._binary_acks.get(name)
+        if ack:
+            ack.set()
+        log.info("link", "%s: binary protocol %s", self.names[name], version)
+        self.set_status(f"{name} switched to binary protocol ({version})")
+
+    def on_link_gap(self, name, lost):
+        self.link_gaps[name] += lost
+        log.warning("link", "%s: %d frame(s) lost, %d total", self.names[name], lost, self.link_gaps[name])
+        self.set_status(f"⚠ {name} link dropped {lost} frame(s) - check count")
+
+    # ---- inbound ------------------------------------------------------
+
+    def setup_dispatchers(self):
+        self.uno_dispatcher = protocol.Dispatcher({
+            protocol.COUNT: self.on_count,
+            protocol.MATCH: self.on_match,
+            protocol.UNO_READY: self.on_uno_ready,
+            protocol.PROTO: lambda version: self.on_proto_ack(UNO, version),
+        })
+        self.nano_temp_dispatcher = protocol.Dispatcher({
+            protocol.TEMP: self.on_temperature,
+            protocol.HOT_AXLE_ALERT: self.on_hot_axle_alert,
+            protocol.NANO_READY: self.on_nano_temp_ready,
+            protocol.PROTO: lambda version: self.on_proto_ack(NANO_TEMP, version),
+        })
+        self.nano_led_dispatcher = protocol.Dispatcher({
+            protocol.LED: self.on_led_state,
+            protocol.NANO_LED_READY: self.on_nano_led_ready,
+            protocol.PROTO: lambda version: self.on_proto_ack(NANO_LED, version),
+        })
+        self.dispatchers = {
+            UNO: self.uno_dispatcher,
+            NANO_TEMP: self.nano_temp_dispatcher,
+            NANO_LED: self.nano_led_dispatcher,
+        }
+        self.line_handlers = {
+            UNO: self.on_uno_line,
+            NANO_TEMP: self.on_nano_temp_line,
+            NANO_LED: self.on_nano_led_line,
+        }
+
+    def on_uno_line(self, frame):
+        log.info("rx", "%s → %s", self.names[UNO], frame)
+        self.process_uno_message(frame)
+
+    def on_nano_temp_line(self, frame):
+        log.info("rx", "%s → %s", self.names[NANO_TEMP], frame)
+        self.process_nano_temp_message(frame)
+
+    def on_nano_led_line(self, frame):
+        log.info("rx", "%s → %s", self.names[NANO_LED], frame)
+        self.process_nano_led_message(frame)
+
+    def process_uno_message(self, frame):
+        return self.uno_dispatcher.dispatch(frame)
+
+    def process_nano_temp_message(self, frame):
+        return self.nano_temp_dispatcher.dispatch(frame)
+
+    def process_nano_led_message(self, frame):
+        return self.nano_led_dispatcher.dispatch(frame)
+
+    def on_count(self, count):
+        self.count_arrival_ns = self.serial_mux.arrival_ns
+        self.axle_count = count
+        self.publish(axle_count=count)
+
+    def on_match(self, match):
+        if match and not self.match_status:
+            # Target just reached!
+            self.match_status = True
+            # The alert stage ends when the write completes, in _sent()
+            self.alert_arrival_ns = self.serial_mux.arrival_ns
+            self.send_to_led_nano("TARGET_REACHED\n")
+            self.publish(match_status=True, status="🎯 TARGET REACHED - Signal sent to LED Nano!")
+        elif not match:
+            self.match_status = False
+            self.publish(match_status=False)
+
+    def on_uno_ready(self, _):
+        if self.connector:
+            self.connector.banner_seen(UNO)
+        self.count_arrival_ns = self.serial_mux.arrival_ns
+        self.publish(status="UNO Ready", axle_count=self.axle_count)
+
+    def on_temperature(self, temperature):
+        self.temperature = temperature
+        if temperature <= NO_SENSOR:
+            self.publish(temperature=temperature)
+            return
+
+        history = self.temperature_history
+        history.append(time.monotonic(), temperature)
+        rate = history.rate() if history.window_span() >= RATE_OF_RISE_MIN_SPAN else 0.0
+        self.temperature_rate = rate
+        if not self.rising_alarm:
+            if rate >= RATE_OF_RISE_ALARM and temperature >= RATE_OF_RISE_MIN_TEMP:
+                self.rising_alarm = True
+                log.warning("temperature", "%s: rising %.1f°C/min at %.1f°C", self.names[NANO_TEMP], rate, temperature)
+                self.set_status(f"⚠ Axle temperature rising {rate:.1f}°C/min")
+        elif rate < RATE_OF_RISE_ALARM / 2:
+            self.rising_alarm = False
+        self.temperature_view = history.snapshot(TEMPERATURE_VIEW_POINTS)
+        self.publish(temperature=temperature, temperature_rate=rate, rising_alarm=self.rising_alarm,
+                     temperature_view=self.temperature_view)
+
+    def on_hot_axle_alert(self, _):
+        self.hot_axle = True
+        self.publish(hot_axle=True)
+
+    def on_nano_temp_ready(self, _):
+        if self.connector:
+            self.connector.banner_seen(NANO_TEMP)
+        self.set_status("Nano Temp Ready")
+
+    def on_led_state(self, led_state):
+        self.command_queues[NANO_LED].confirm(led_state)
+        self.led_state = led_state
+        self.publish(led_state=led_state)
+
+    def on_nano_led_ready(self, _):
+        if self.connector:
+            self.connector.banner_seen(NANO_LED)
+        self.led_state = "CONNECTED"
+        self.publish(led_state="CONNECTED", status="Nano LED Ready")
+
+    # ---- commands -----------------------------------------------------
+    # Callable from any thread (Tk buttons included); the state change and
+    # the writes are applied on the loop, in order with incoming messages.
+
+    def set_compare_mode(self, target):
+        self.serial_mux.call(self._set_compare_mode, target)
+
+    def set_count_mode(self):
+        self.serial_mux.call(self._set_count_mode)
+
+    def reset_count(self):
+        self.serial_mux.call(self._reset_count)
+
+    def _set_compare_mode(self, target):
+        self.compare_mode = True
+        self.target_count = target
+        # One write, so the UNO never sees COMPARE with a stale target
+        self.send_command(UNO, "MODE:COMPARE", f"TARGET:{target}")
+        self.publish(compare_mode=True, target_count=target, status=f"Compare mode - Target: {target}")
+
+    def _set_count_mode(self):
+        self.compare_mode = False
+        self.target_count = 0
+        self.match_status = False
+        self.send_to_uno("MODE:COUNT\n")
+        self.send_to_led_nano("RESET\n")
+        self.publish(compare_mode=False, target_count=0, match_status=False, status="Count mode - no target")
+
+    def _reset_count(self):
+        self.send_to_uno("RESET\n")
+        self.send_to_led_nano("RESET\n")
+        self.axle_count = 0
+        self.match_status = False
+        # Not driven by serial input, so not a pipeline latency sample
+        self.count_arrival_ns = 0
+        self.publish(axle_count=0, match_status=False, status="✓ Count reset to 0")
+
+    async def write_async(self, name, data, timeout=WRITE_TIMEOUT):
+        """Queue data for a board and return once the bytes are out"""
+        if not self.serial[name]:
+            raise ConnectionError(f"{name} is not connected")
+        if self.recorder:
+            self.recorder.outbound(self.names[name], data)
+        await asyncio.wait_for(asyncio.shield(self._send(name, data)), timeout)
+
+    def _send(self, name, data):
+        log.frame(self.names[name], ">", data)
+        future = self.serial_mux.send(self.names[name], data)
+        future.add_done_callback(lambda done: self._sent(name, data, done))
+        return future
+
+    def _sent(self, name, data, future):
+        error = None if future.cancelled() else future.exception()
+        if name == NANO_LED and self.alert_arrival_ns and b"TARGET_REACHED" in data:
+            if error is None:
+                self.metrics.alert.observe_ns(time.perf_counter_ns() - self.alert_arrival_ns)
+            self.alert_arrival_ns = 0
+        if error is not None:
+            self.set_status(f"{name} send error: {error}")
+            return
+        self.bytes_out[name] += len(data)
+        log.info("tx", "SENT TO %s: %s", self.names[name], data)
+
+    def send_command(self, name, *commands):
+        """Queue commands for a board from any thread; never blocks.
+
+        Returns False if the board isn't connected. Delivery problems are
+        reported through on_command_event.
+        """
+        if not self.serial[name]:
+            return False
+        self.serial_mux.call(self.command_queues[name].put, *commands)
+        return True
+
+    def on_command_event(self, name, kind, detail):
+        log.warning("command", "%s %s: %s", self.names[name], kind, detail)
+        self.set_status(f"⚠ {name}: {detail}")
+
+    def send_to_uno(self, message):
+        self.send_command(UNO, message.strip())
+
+    def send_to_led_nano(self, message):
+        """Send command to LED Nano controller"""
+        self.send_command(NANO_LED, message.strip())
+
+
+def run_headless(target=None, ports=None, record=None, metrics_port=None, events=None, dashboard_port=None,
+                 shared_state=None):
+    """Run the engine without Tk until SIGINT/SIGTERM"""
+    engine = AxleCounterEngine(ports)
+    if shared_state:
+        engine.share_state(shared_state)
+    if record:
+        engine.record_to(record)
+    if events:
+        engine.store_events(events)
+    if metrics_port:
+        engine.serve_metrics(metrics_port)
+    if dashboard_port:
+        engine.serve_dashboard(dashboard_port)
+    stop = threading.Event()
+
+    def on_change(changes):
+        if "status" in changes:
+            log.info("status", "%s", changes["status"])
+
+    def on_ready(changes):
+        # Apply the requested target once the UNO is up
+        states = changes.get("device_states")
+        if target and states and states.get(UNO) == "ready":
+            engine.unsubscribe(on_ready)
+            engine.set_compare_mode(target)
+
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    log.install_dump_signal()
+
+    engine.subscribe(on_change)
+    engine.subscribe(on_ready)
+    engine.start()
+    try:
+        stop.wait()
+    finally:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    run_headless()
@@ -0,0 +1,490 @@
+#!/usr/bin/env python3
+"""The counting engine in its own process, linked to the Tk window.
+
+With the engine in the GUI process, the serial loop shares the GIL with
+Tk, so a long redraw or a modal dialog delays how fast the boards are
+drained. RemoteEngine stands in for AxleCounterEngine in the window and
+runs the real one in a worker process:
+
+    engine = RemoteEngine(ports, cpu=2)     # same methods the window uses
+    engine.store_events(path)               # replayed in the worker
+    engine.start()
+
+The two talk over a unix socket (multiprocessing.connection). The worker
+forwards state changes, coalesced while the window is slow to take them,
+and once a second the port counters and latency summary. The window sends
+commands (compare/count mode, reset) and its GUI latency samples back.
+
+Either side can die without taking the other down:
+  - if the worker dies, RemoteEngine starts a new one with backoff, seeded
+    with the target, and the gap is recorded as an ENGINE outage
+  - if the window dies, the worker keeps counting (event store, shared
+    state, dashboard) and a new window attaches to it instead of starting
+    another one; only a "stop" from a window shuts it down
+
+The worker runs in its own session (Ctrl-C in the terminal is for the
+window) and can be pinned to a core. It can also be started by hand:
+
+    python3 engine_process.py [--cpu N] [--address PATH] [--config JSON]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import log
+from engine import ROLES, UNO, AxleCounterEngine
+from gui_state import StateStore
+
+RUNTIME_DIR = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+DEFAULT_ADDRESS = os.path.join(RUNTIME_DIR, f"adld_engine-{os.getuid()}.sock")
+
+STATS_INTERVAL = 1.0
+SPAWN_TIMEOUT = 10.0
+RESTART_MIN = 0.5
+RESTART_MAX = 8.0
+STOP_TIMEOUT = 5.0
+
+# Engine methods a window may call, and those replayed when the worker starts
+COMMANDS = ("set_compare_mode", "set_count_mode", "reset_count", "observe_gui")
+SETUP = ("share_state", "record_to", "store_events", "serve_metrics", "serve_dashboard")
+
+# Fields RemoteEngine mirrors as attributes
+FIELDS = ("axle_count", "target_count", "temperature", "compare_mode", "match_status", "hot_axle",
+          "temperature_rate", "rising_alarm", "temperature_view", "led_state")
+
+
+# ---- worker side ------------------------------------------------------
+
+class EngineServer:
+    """Serves one window at a time over the socket at address"""
+
+    def __init__(self, engine, address=DEFAULT_ADDRESS):
+        self.engine = engine
+        self.address = address
+        self._claim(address)
+        # Only this user may drive the engine
+        umask = os.umask(0o177)
+        try:
+            self.listener = Listener(address, family="AF_UNIX")
+        finally:
+            os.umask(umask)
+
+        self.conn = None
+        self.running = True
+        self.store = StateStore()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._sender = threading.Thread(target=self._send_loop, name="engine-link", daemon=True)
+
+    @staticmethod
+    def _claim(address):
+        if not os.path.exists(address):
+            return
+        try:
+            Client(address, family="AF_UNIX").close()
+        except OSError:
+            # Left behind by a worker that was killed
+            os.unlink(address)
+            return
+        raise FileExistsError(f"an engine is already serving {address}")
+
+    def on_changes(self, changes):
+        """Engine subscriber: coalesce, never block the serial loop"""
+        self.store.set(**changes)
+        self._wake.set()
+
+    def serve_forever(self):
+        self._sender.start()
+        while self.running:
+            conn = self.listener.accept()
+            log.info("engine", "window attached")
+            with self._lock:
+                self.conn = conn
+            # Start the new window from a full snapshot, in order with the changes
+            self.engine.serial_mux.call(lambda: self.on_changes(self.engine.snapshot()))
+            self._receive(conn)
+            with self._lock:
+                self.conn = None
+            conn.close()
+            if self.running:
+                log.warning("engine", "window went away; still counting, waiting for it to come back")
+
+    def _receive(self, conn):
+        engine = self.engine
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            name, args = message[0], message[1:]
+            if name == "stop":
+                self.running = False
+                return
+            if name == "observe_gui":
+                engine.metrics.gui.observe_ns(*args)
+            elif name in COMMANDS:
+                getattr(engine, name)(*args)
+            else:
+                log.warning("engine", "unknown command from window: %r", name)
+
+    def _send_loop(self):
+        next_stats = 0.0
+        while self.running:
+            self._wake.wait(STATS_INTERVAL)
+            self._wake.clear()
+            conn = self.conn
+            if conn is None:
+                continue
+            messages = []
+            changes = self.store.take_changes()
+            if changes:
+                messages.append(("changes", changes, self.engine.count_arrival_ns))
+            now = time.monotonic()
+            if now >= next_stats:
+                next_stats = now + STATS_INTERVAL
+                messages.append(("stats", self.engine.port_counters(), self.engine.metrics.summary(), os.getpid()))
+            try:
+                for message in messages:
+                    conn.send(message)
+            except (OSError, ValueError):
+                # The receiving side notices too and goes back to accept()
+                pass
+
+    def close(self):
+        self.running = False
+        self._wake.set()
+        with self._lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+        self.listener.close()
+
+
+def serve(config, address=DEFAULT_ADDRESS, cpu=None):
+    """Run an engine for windows to attach to until a window sends stop,
+    or SIGTERM/SIGINT.
+
+    config: {"ports": {role: path}, "setup": [[method, args]],
+             "target": n, "outage": {...}} (all optional)
+    """
+    if cpu is not None:
+        try:
+            os.sched_setaffinity(0, {cpu})
+            log.info("engine", "pinned to CPU %d", cpu)
+        except (AttributeError, OSError) as e:
+            log.warning("engine", "cannot pin to CPU %d: %s", cpu, e)
+
+    engine = AxleCounterEngine(config.get("ports") or None)
+    # Claim the socket before binding anything else
+    server = EngineServer(engine, address)
+    for method, args in config.get("setup", ()):
+        if method in SETUP:
+            getattr(engine, method)(*args)
+
+    target = config.get("target")
+
+    def on_ready(changes):
+        # Re-apply the window's target once the UNO is up
+        states = changes.get("device_states")
+        if states and states.get(UNO) == "ready":
+            engine.unsubscribe(on_ready)
+            engine.set_compare_mode(target)
+
+    def terminate(*_):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    signal.signal(signal.SIGINT, terminate)
+    log.install_dump_signal()
+
+    engine.subscribe(server.on_changes)
+    if target:
+        engine.subscribe(on_ready)
+    engine.start()
+    outage = config.get("outage")
+    if outage:
+        outage["seconds"] = round(time.time() - outage["start"], 3)
+        log.warning("engine", "restarted after %.1fs", outage["seconds"])
+        engine.publish(outage=outage, status=f"⚠ Engine restarted after {outage['seconds']:.1f}s - axles may have been missed")
+    log.info("engine", "serving %s (pid %d)", address, os.getpid())
+    try:
+        server.serve_forever()
+    finally:
+        server.close()
+        engine.stop()
+
+
+# ---- window side ------------------------------------------------------
+
+class _GuiStage:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def observe_ns(self, value_ns):
+        self.engine._call("observe_gui", value_ns)
+
+
+class RemoteMetrics:
+    """The worker's latency summary; GUI samples go to its histograms"""
+
+    def __init__(self, engine):
+        self.gui = _GuiStage(engine)
+        self.text = "p99 --"
+
+    def summary(self):
+        return self.text
+
+
+class RemoteEngine:
+    """AxleCounterEngine's window-facing interface, backed by a worker process"""
+
+    def __init__(self, ports=None, address=DEFAULT_ADDRESS, cpu=None):
+        self.ports = dict(ports or {})
+        self.address = address
+        self.cpu = cpu
+        self.setup = []
+
+        # Last state received from the worker
+        self.axle_count = 0
+        self.target_count = 0
+        self.temperature = 0.0
+        self.compare_mode = False
+        self.match_status = False
+        self.hot_axle = False
+        self.temperature_rate = 0.0
+        self.rising_alarm = False
+        self.led_state = "OFF"
+        self.device_states = {role: "discovering" for role in ROLES}
+        self.temperature_view = None
+        self.count_arrival_ns = 0
+        self.counters = {}
+        self.metrics = RemoteMetrics(self)
+
+        self._subscribers = []
+        self.conn = None
+        self.process = None
+        self.worker_pid = None
+        self.restarts = 0
+        self.running = False
+        self._send_lock = threading.Lock()
+        self._thread = None
+
+    # ---- same interface as AxleCounterEngine ----------------------------
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        callback(self.snapshot())
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def snapshot(self):
+        snapshot = {field: getattr(self, field) for field in FIELDS}
+        snapshot["device_states"] = dict(self.device_states)
+        return snapshot
+
+    def publish(self, **changes):
+        for callback in list(self._subscribers):
+            try:
+                callback(changes)
+            except Exception as e:
+                log.error("engine", "subscriber error: %r", e)
+
+    def port_counters(self):
+        return self.counters
+
+    def record_to(self, path):
+        self.setup.append(("record_to", (os.path.abspath(path),)))
+
+    def store_events(self, path):
+        self.setup.append(("store_events", (os.path.abspath(path),)))
+
+    def serve_metrics(self, port):
+        self.setup.append(("serve_metrics", (port,)))
+
+    def serve_dashboard(self, port, host="0.0.0.0"):
+        self.setup.append(("serve_dashboard", (port, host)))
+
+    def share_state(self, name):
+        self.setup.append(("share_state", (name,)))
+
+    def set_compare_mode(self, target):
+        self._call("set_compare_mode", target)
+
+    def set_count_mode(self):
+        self._call("set_count_mode")
+
+    def reset_count(self):
+        self._call("reset_count")
+
+    # ---- lifecycle ----------------------------------------------------
+
+    def start(self):
+        """Attach to a running worker or start one, in the background"""
+        self.running = True
+        self._thread = threading.Thread(target=self._supervise, name="engine-supervisor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """Stop the worker (whoever started it) and wait for it to exit"""
+        self.running = False
+        if self.conn:
+            self._call("stop")
+        elif self.process:
+            # Still starting up; nothing to hand over yet
+            self.process.terminate()
+        if self.process:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                log.warning("engine", "worker %d did not stop; terminating it", self.process.pid)
+                self.process.terminate()
+        elif self.worker_pid:
+            # Attached to a worker started elsewhere; its ports must be free on return
+            self._wait_exit(self.worker_pid, timeout)
+        if self._thread:
+            self._thread.join(timeout)
+
+    @staticmethod
+    def _wait_exit(pid, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                os.kill(pid, 0)
+            except OSError:
+                return
+            time.sleep(0.05)
+
+    def _call(self, *message):
+        conn = self.conn
+        if conn is None:
+            if message[0] != "observe_gui":
+                self.publish(status="⚠ Engine restarting - command not sent")
+            return
+        with self._send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                pass
+
+    def _supervise(self):
+        delay = RESTART_MIN
+        lost_at = None
+        while self.running:
+            conn = self._connect(lost_at)
+            if conn is None:
+                if not self.running:
+                    break
+                time.sleep(delay)
+                delay = min(delay * 2, RESTART_MAX)
+                continue
+            delay = RESTART_MIN
+            self.conn = conn
+            if not self.running:
+                # stop() came while connecting
+                self._call("stop")
+            self._receive(conn)
+            self.conn = None
+            conn.close()
+            if not self.running:
+                break
+            lost_at = {"role": "ENGINE", "start": round(time.time(), 3), "count_before": self.axle_count}
+            if self.process:
+                # Let a dying worker release its socket before reconnecting
+                try:
+                    self.process.wait(RESTART_MIN)
+                except subprocess.TimeoutExpired:
+                    pass
+            self.restarts += 1
+            log.error("engine", "lost the engine process (pid %s); restarting", self.worker_pid)
+            self.device_states = {role: "lost" for role in self.device_states}
+            self.publish(device_states=dict(self.device_states), status="⚠ Engine process lost - restarting")
+
+    def _connect(self, outage):
+        try:
+            # A worker outliving a previous window keeps its state
+            conn = Client(self.address, family="AF_UNIX")
+            log.info("engine", "attached to the running engine at %s", self.address)
+            return conn
+        except OSError:
+            pass
+        if self.process and self.process.poll() is None:
+            # Ours, but not answering: make room for a new one
+            self.process.kill()
+            self.process.wait()
+        self.process = self._spawn(outage)
+        deadline = time.monotonic() + SPAWN_TIMEOUT
+        while self.running and time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                log.error("engine", "worker exited with status %d", self.process.returncode)
+                return None
+            try:
+                return Client(self.address, family="AF_UNIX")
+            except OSError:
+                time.sleep(0.05)
+        return None
+
+    def _spawn(self, outage):
+        config = {"ports": self.ports, "setup": self.setup}
+        if self.compare_mode and self.target_count:
+            config["target"] = self.target_count
+        if outage:
+            config["outage"] = outage
+        command = [sys.executable, os.path.abspath(__file__), "--address", self.address,
+                   "--config", json.dumps(config),
+                   "--log-level", log.LEVEL_NAMES[log.LOGGER.level].lower(), "--log-format", log.LOGGER.fmt]
+        if self.cpu is not None:
+            command += ["--cpu", str(self.cpu)]
+        # Own session: a Ctrl-C or hangup meant for the window doesn't reach it
+        process = subprocess.Popen(command, start_new_session=True)
+        log.info("engine", "started engine process %d", process.pid)
+        return process
+
+    def _receive(self, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == "changes":
+                self._apply(*message[1:])
+            elif message[0] == "stats":
+                self.counters, self.metrics.text, self.worker_pid = message[1:]
+
+    def _apply(self, changes, arrival_ns):
+        for field in FIELDS:
+            if field in changes:
+                setattr(self, field, changes[field])
+        if "device_states" in changes:
+            self.device_states = changes["device_states"]
+        if "axle_count" in changes:
+            self.count_arrival_ns = arrival_ns
+        self.publish(**changes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the axle counter engine for the window to attach to")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help=f"unix socket path (default {DEFAULT_ADDRESS})")
+    parser.add_argument("--cpu", type=int, help="pin the engine to this CPU core")
+    parser.add_argument("--config", default="{}", help="JSON: ports, setup calls, target (set by the window)")
+    log.add_arguments(parser)
+    args = parser.parse_args()
+    log.configure(level=args.log_level, fmt=args.log_format)
+    try:
+        serve(json.loads(args.config), args.address, args.cpu)
+    except FileExistsError as e:
+        log.error("engine", "%s", e)
+        log.flush()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
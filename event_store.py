@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Persistent, append-only store of engine events.
+
+The store subscribes to the engine like any front end. Each change dict is
+timestamped and put on a bounded queue; if the writer ever falls that far
+behind, events are dropped and counted rather than blocking the serial
+reactor or the Tk loop. A dedicated writer thread drains the queue and
+inserts whole batches per transaction into SQLite in WAL mode. Readers
+(query(), the CLI) can run while the writer is busy.
+
+One row per changed field:
+
+    events(t REAL wall-clock seconds, kind TEXT, value REAL, text TEXT,
+           section TEXT, NULL for a single-section installation)
+
+indexed on t and (kind, t), so time-range queries never scan the table.
+
+Usage:
+    python3 event_store.py query [--since 24h] [--kind COUNT] [--section NAME] [--db PATH]
+    python3 event_store.py stats [--db PATH]
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import log
+from defaults import EVENTS_PATH as DB_PATH
+
+QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 0.5
+
+# Engine field -> event kind. Derived values (temperature_rate) aren't stored
+KINDS = {
+    "axle_count": "COUNT",
+    "match_status": "MATCH",
+    "temperature": "TEMP",
+    "hot_axle": "HOT_AXLE",
+    "rising_alarm": "RISING",
+    "led_state": "LED",
+    "compare_mode": "MODE",
+    "target_count": "TARGET",
+    "device_states": "DEVICES",
+    "status": "STATUS",
+    "outage": "OUTAGE",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    t REAL NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL,
+    text TEXT,
+    section TEXT
+);
+CREATE INDEX IF NOT EXISTS events_t ON events (t);
+CREATE INDEX IF NOT EXISTS events_kind_t ON events (kind, t);
+"""
+
+
+def connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _rows(t, section, changes):
+    for field, value in changes.items():
+        kind = KINDS.get(field)
+        if kind is None:
+            continue
+        if isinstance(value, (bool, int, float)):
+            yield t, kind, float(value), None, section
+        elif isinstance(value, dict):
+            yield t, kind, None, json.dumps(value), section
+        else:
+            yield t, kind, None, str(value), section
+
+
+class EventStore:
+    def __init__(self, path=DB_PATH, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = connect(path)
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(events)")]
+        if "section" not in columns:
+            conn.execute("ALTER TABLE events ADD COLUMN section TEXT")
+        conn.close()
+
+        self._thread = threading.Thread(target=self._writer, name="event-store", daemon=True)
+        self._thread.start()
+
+    def on_changes(self, changes):
+        """Engine subscriber: never blocks, drops when the queue is full"""
+        try:
+            self.queue.put_nowait((time.time(), None, changes))
+        except queue.Full:
+            self.dropped += 1
+
+    def subscriber(self, section):
+        """Like on_changes, but rows are tagged with a track section"""
+        def on_changes(changes):
+            try:
+                self.queue.put_nowait((time.time(), section, changes))
+            except queue.Full:
+                self.dropped += 1
+        return on_changes
+
+    def close(self, timeout=5.0):
+        """Write everything still queued, then stop the writer"""
+        self.queue.put(None)
+        self._thread.join(timeout)
+
+    def _writer(self):
+        conn = connect(self.path)
+        try:
+            running = True
+            while running:
+                try:
+                    item = self.queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    continue
+                batch = []
+                while item is not None:
+                    batch.extend(_rows(*item))
+                    if len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                running = item is not None
+                if batch:
+                    try:
+                        with conn:
+                            conn.executemany(
+                                "INSERT INTO events (t, kind, value, text, section) VALUES (?, ?, ?, ?, ?)", batch)
+                        self.written += len(batch)
+                    except sqlite3.Error as e:
+                        log.error("events", "write failed: %s", e)
+        finally:
+            conn.close()
+
+    def query(self, start=None, end=None, kind=None, limit=None, section=None):
+        """[(t, kind, value, text, section)] with start <= t < end, oldest first"""
+        return query(self.path, start, end, kind, limit, section)
+
+
+def query(path, start=None, end=None, kind=None, limit=None, section=None):
+    sql = "SELECT t, kind, value, text, section FROM events WHERE t >= ? AND t < ?"
+    args = [start if start is not None else 0.0, end if end is not None else float("inf")]
+    if kind:
+        sql += " AND kind = ?"
+        args.append(kind)
+    if section:
+        sql += " AND section = ?"
+        args.append(section)
+    sql += " ORDER BY t"
+    if limit:
+        sql += " LIMIT ?"
+        args.append(limit)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+
+def parse_since(text):
+    """'90s', '15m', '24h', '7d' -> seconds"""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the axle counter event store")
+    parser.add_argument("--db", default=DB_PATH, help=f"event database (default {DB_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_query = sub.add_parser("query")
+    p_query.add_argument("--since", default="24h", help="how far back, e.g. 90s, 15m, 24h, 7d (default 24h)")
+    p_query.add_argument("--kind", help="only this event kind, e.g. COUNT, MATCH, TEMP")
+    p_query.add_argument("--section", help="only this track section")
+    p_query.add_argument("--limit", type=int)
+    sub.add_parser("stats")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+        rows = conn.execute("SELECT kind, COUNT(*), MIN(t), MAX(t) FROM events GROUP BY kind ORDER BY kind").fetchall()
+        conn.close()
+        for kind, count, first, last in rows:
+            span = f"{datetime.fromtimestamp(first):%Y-%m-%d %H:%M:%S} .. {datetime.fromtimestamp(last):%Y-%m-%d %H:%M:%S}"
+            print(f"{kind:<10} {count:10d}  {span}")
+        return
+
+    start = time.time() - parse_since(args.since)
+    began = time.perf_counter()
+    rows = query(args.db, start, kind=args.kind, limit=args.limit, section=args.section)
+    elapsed = time.perf_counter() - began
+    for t, kind, value, text, section in rows:
+        shown = text if text is not None else (f"{value:g}" if value is not None else "")
+        where = f"{section:<12} " if section else ""
+        print(f"{datetime.fromtimestamp(t):%Y-%m-%d %H:%M:%S.%f}"[:-3] + f"  {where}{kind:<10} {shown}")
+    print(f"{len(rows)} events in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
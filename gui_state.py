@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Thread-safe state store and frame-capped Tk update pump.
+
+Serial reader code writes fields into a StateStore from any thread. A
+GuiPump running on the Tk thread collects whatever changed since the last
+frame and applies only the latest value of each field, so a burst of
+messages costs at most one redraw per frame.
+
+Within a frame, WidgetCache remembers the options last applied to each
+widget and only sends the ones that actually differ to Tcl, so redrawing
+an unchanged label or BCD bit costs a dict lookup instead of a configure.
+"""
+import threading
+from time import perf_counter_ns
+
+import log
+
+
+class StateStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+        self._dirty = set()
+
+    def set(self, **fields):
+        with self._lock:
+            self._values.update(fields)
+            self._dirty.update(fields)
+
+    def get(self, name, default=None):
+        with self._lock:
+            return self._values.get(name, default)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def take_changes(self):
+        """Return {field: latest value} for fields changed since the last call"""
+        with self._lock:
+            if not self._dirty:
+                return {}
+            changes = {name: self._values[name] for name in self._dirty}
+            self._dirty.clear()
+            return changes
+
+
+_UNSET = object()
+
+
+class WidgetCache:
+    """configure()/itemconfigure() that skip options already in effect.
+
+    Only valid for options changed through the cache; anything else
+    that reconfigures the widget must go through it too.
+    """
+
+    def __init__(self):
+        self._options = {}
+        self.applied = 0
+        self.skipped = 0
+
+    def config(self, widget, **options):
+        self._apply(widget, options, widget.configure)
+
+    def itemconfig(self, canvas, item, **options):
+        self._apply((canvas, item), options, lambda **changed: canvas.itemconfigure(item, **changed))
+
+    def _apply(self, key, options, configure):
+        last = self._options.get(key)
+        if last is None:
+            last = self._options[key] = {}
+        changed = {name: value for name, value in options.items() if last.get(name, _UNSET) != value}
+        if not changed:
+            self.skipped += 1
+            return
+        configure(**changed)
+        last.update(changed)
+        self.applied += 1
+
+    def summary(self):
+        total = self.applied + self.skipped
+        return f"cfg {self.applied}/{total}" if total else "cfg 0/0"
+
+
+class GuiPump:
+    def __init__(self, root, store, apply, fps=30):
+        self.root = root
+        self.store = store
+        self.apply = apply
+        self.interval_ms = max(1, int(1000 / fps))
+        self._after_id = None
+        # Main-loop time spent applying changes
+        self.frames = 0
+        self.busy_ns = 0
+
+    def start(self):
+        self._tick()
+
+    def stop(self):
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        changes = self.store.take_changes()
+        if changes:
+            start = perf_counter_ns()
+            try:
+                self.apply(changes)
+            except Exception as e:
+                log.error("gui", "update error: %r", e)
+            self.busy_ns += perf_counter_ns() - start
+            self.frames += 1
+        self._after_id = self.root.after(self.interval_ms, self._tick)
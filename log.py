@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Structured, rate-limited logging that never blocks the serial loop.
+
+log.info("rx", "%s → %s", port, frame) only checks the level and the
+category's rate limit, then appends (time, level, category, message,
+args, fields) to an in-memory ring. A background thread drains the ring
+every FLUSH_INTERVAL (at once for warnings and errors), formats the
+records and writes them to stdout, so a slow console or journald pipe
+only ever delays that thread. If it falls a whole ring behind, the oldest
+records are dropped and counted.
+
+Noisy categories are rate limited with a token bucket (RATE_LIMITS); the
+number of records suppressed is reported on the next one that gets
+through. bytes arguments are decoded when formatting, so callers pass
+frames as they are.
+
+Independently of the level, the last FRAME_CAPACITY raw frames, in and
+out, are kept for debugging. dump_frames() writes them out;
+install_dump_signal() makes SIGUSR1 do that for a running process:
+
+    kill -USR1 <pid>
+"""
+import atexit
+import json
+import signal
+import sys
+import threading
+import time
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+LEVELS = {name.lower(): level for level, name in LEVEL_NAMES.items()}
+
+CAPACITY = 8192
+FRAME_CAPACITY = 256
+FLUSH_INTERVAL = 0.1
+
+# category -> (records per second, burst)
+RATE_LIMITS = {
+    "rx": (10.0, 50),
+    "tx": (10.0, 50),
+}
+
+
+class RateLimit:
+    """Token bucket; suppressed counts what was refused since the last pass"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.suppressed = 0
+        self.suppressed_total = 0
+
+    def allow(self, now):
+        tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if tokens < 1.0:
+            self.tokens = tokens
+            self.suppressed += 1
+            self.suppressed_total += 1
+            return False
+        self.tokens = tokens - 1.0
+        return True
+
+
+class Logger:
+    def __init__(self, level=INFO, limits=RATE_LIMITS, capacity=CAPACITY,
+                 frame_capacity=FRAME_CAPACITY, stream=None, fmt="text"):
+        self.level = level
+        self.limits = {category: RateLimit(*limit) for category, limit in limits.items()}
+        self.capacity = capacity
+        self.records = deque(maxlen=capacity)
+        self.frames = deque(maxlen=frame_capacity)
+        self.stream = stream
+        self.fmt = fmt
+
+        self.written = 0
+        self.dropped = 0
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def configure(self, level=None, fmt=None, limits=None):
+        if level is not None:
+            self.level = LEVELS[level] if isinstance(level, str) else level
+        if fmt is not None:
+            self.fmt = fmt
+        if limits is not None:
+            self.limits = {category: RateLimit(*limit) for category, limit in limits.items()}
+
+    # ---- producers (any thread) ----------------------------------------
+
+    def log(self, level, category, message, *args, **fields):
+        if level < self.level:
+            return
+        now = time.time()
+        limit = self.limits.get(category)
+        suppressed = 0
+        if limit:
+            if not limit.allow(time.monotonic()):
+                return
+            suppressed, limit.suppressed = limit.suppressed, 0
+        if len(self.records) == self.capacity:
+            self.dropped += 1
+        self.records.append((now, level, category, message, args, fields, suppressed))
+        if self._thread is None:
+            self.start()
+        if level >= WARNING:
+            self._wake.set()
+
+    def debug(self, category, message, *args, **fields):
+        self.log(DEBUG, category, message, *args, **fields)
+
+    def info(self, category, message, *args, **fields):
+        self.log(INFO, category, message, *args, **fields)
+
+    def warning(self, category, message, *args, **fields):
+        self.log(WARNING, category, message, *args, **fields)
+
+    def error(self, category, message, *args, **fields):
+        self.log(ERROR, category, message, *args, **fields)
+
+    def frame(self, port, direction, data):
+        """Remember a raw frame ("<" in, ">" out) whatever the level"""
+        self.frames.append((time.time(), port, direction, data))
+
+    # ---- writer thread ---------------------------------------------------
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write out everything in the ring (normally the writer thread's job)"""
+        lines = []
+        records = self.records
+        while records:
+            try:
+                record = records.popleft()
+            except IndexError:
+                break
+            lines.append(self.format(record))
+        if not lines:
+            return
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+        except (OSError, ValueError):
+            return
+        self.written += len(lines)
+
+    def format(self, record):
+        t, level, category, message, args, fields, suppressed = record
+        if args:
+            try:
+                message = message % tuple(_text(arg) for arg in args)
+            except (TypeError, ValueError):
+                message = f"{message} {args!r}"
+        if self.fmt == "json":
+            entry = {"t": round(t, 3), "level": LEVEL_NAMES[level], "category": category, "msg": message}
+            entry.update({key: _text(value) for key, value in fields.items()})
+            if suppressed:
+                entry["suppressed"] = suppressed
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        stamp = time.strftime("%H:%M:%S", time.localtime(t))
+        line = f"{stamp}.{int(t % 1 * 1000):03d} {LEVEL_NAMES[level]:<7} {category:<8} {message}"
+        if fields:
+            line += " " + " ".join(f"{key}={_text(value)}" for key, value in fields.items())
+        if suppressed:
+            line += f" ({suppressed} {category} record(s) suppressed)"
+        return line
+
+    # ---- debugging -------------------------------------------------------
+
+    def dump_frames(self, stream=None):
+        """Write the remembered raw frames, oldest first"""
+        stream = stream or sys.stderr
+        frames = list(self.frames)
+        stream.write(f"--- last {len(frames)} frame(s) ---\n")
+        for t, port, direction, data in frames:
+            stamp = time.strftime("%H:%M:%S", time.localtime(t))
+            stream.write(f"{stamp}.{int(t % 1 * 1000):03d} {port} {direction} {data!r}\n")
+        stream.flush()
+
+    def suppressed(self):
+        """{category: records refused by its rate limit}"""
+        return {category: limit.suppressed_total for category, limit in self.limits.items()}
+
+
+def _text(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode("utf-8", errors="replace").strip().replace("\n", " + ")
+    return value
+
+
+LOGGER = Logger()
+
+configure = LOGGER.configure
+debug = LOGGER.debug
+info = LOGGER.info
+warning = LOGGER.warning
+error = LOGGER.error
+frame = LOGGER.frame
+flush = LOGGER.flush
+dump_frames = LOGGER.dump_frames
+
+
+def install_dump_signal():
+    """Dump the frame ring to stderr on SIGUSR1 (main thread only)"""
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda *_: dump_frames())
+
+
+def add_arguments(parser):
+    parser.add_argument("--log-level", choices=sorted(LEVELS, key=LEVELS.get), default="info",
+                        help="minimum level written to stdout (default info)")
+    parser.add_argument("--log-format", choices=("text", "json"), default="text",
+                        help="one line of text or one JSON object per record")
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Hot-path latency histograms, per-port counters and a Prometheus endpoint.
+
+Stage latencies are all measured from the moment the reactor woke up for
+the bytes (byte arrival), so the histograms show where a late event spent
+its time:
+
+    framed    bytes read and split into frames
+    handled   last frame of the read dispatched to its handler
+    gui       count applied to the Tk widgets
+    alert     TARGET_REACHED written to the LED Nano after MATCH:TRUE
+
+Recording is a perf_counter_ns() call and a bisect into fixed buckets.
+Counters live on the objects that already touch the data (reactor
+channels, dispatchers, the engine) and are only gathered when the
+endpoint is scraped.
+"""
+import bisect
+import threading
+
+import log
+from defaults import METRICS_PORT as DEFAULT_PORT
+
+# Bucket upper bounds in seconds
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+STAGES = ("framed", "handled", "gui", "alert")
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds_ns = [int(b * 1e9) for b in buckets]
+        self.buckets = buckets
+        # One extra slot for +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ns = 0
+        self.count = 0
+
+    def observe_ns(self, value_ns):
+        self.counts[bisect.bisect_left(self.bounds_ns, value_ns)] += 1
+        self.total_ns += value_ns
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bucket bound (seconds) below which q of the samples fall"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    def __init__(self):
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.framed = self.stages["framed"]
+        self.handled = self.stages["handled"]
+        self.gui = self.stages["gui"]
+        self.alert = self.stages["alert"]
+
+    def summary(self):
+        """Compact one-line p99 overview for the status bar"""
+        parts = []
+        for stage, histogram in self.stages.items():
+            p99 = histogram.quantile(0.99)
+            if p99 is not None:
+                parts.append(f"{stage} ≤{_format_seconds(p99)}")
+        return "p99 " + "  ".join(parts) if parts else "p99 --"
+
+
+def _format_seconds(value):
+    if value == float("inf"):
+        return ">2.5s"
+    if value < 0.001:
+        return f"{value * 1e6:.0f}µs"
+    if value < 1:
+        return f"{value * 1e3:g}ms"
+    return f"{value:g}s"
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(engines, event_store=None):
+    """Gather every counter and histogram into Prometheus text format.
+
+    engines share one Metrics when they share a reactor (track sections),
+    so the stage histograms come from the first one.
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {value}")
+
+    ports = {}
+    for engine in engines:
+        for role, counters in engine.port_counters().items():
+            ports[engine.names[role]] = counters
+    for key, help_text in (
+        ("bytes_in", "Bytes read from the port"),
+        ("bytes_out", "Bytes written to the port"),
+        ("messages", "Frames received"),
+        ("parse_errors", "Frames that failed to parse or verify"),
+        ("unknown", "Frames with an unknown tag"),
+        ("frames_lost", "Binary frames lost according to sequence gaps"),
+        ("reconnects", "Times the port was reopened"),
+        ("outages", "Times the board dropped out and came back"),
+        ("outage_seconds", "Seconds the board was unavailable"),
+        ("commands_collapsed", "Queued commands superseded before they were written"),
+        ("send_timeouts", "Command batches not written within the send timeout"),
+        ("unconfirmed", "Commands the board never confirmed"),
+    ):
+        metric(f"adld_port_{key}_total", "counter", help_text,
+               [(_labels(port=name), counters[key]) for name, counters in ports.items()])
+
+    lines.append("# HELP adld_stage_latency_seconds Latency from byte arrival to each pipeline stage")
+    lines.append("# TYPE adld_stage_latency_seconds histogram")
+    for stage, histogram in engines[0].metrics.stages.items():
+        cumulative = 0
+        for bound, n in zip(histogram.buckets, histogram.counts):
+            cumulative += n
+            lines.append(f"adld_stage_latency_seconds_bucket{_labels(stage=stage, le=bound)} {cumulative}")
+        lines.append(f"adld_stage_latency_seconds_bucket{_labels(stage=stage, le='+Inf')} {histogram.count}")
+        lines.append(f"adld_stage_latency_seconds_sum{_labels(stage=stage)} {histogram.total_ns / 1e9}")
+        lines.append(f"adld_stage_latency_seconds_count{_labels(stage=stage)} {histogram.count}")
+
+    def gauge(name, help_text, field):
+        metric(name, "gauge", help_text,
+               [(_labels(section=e.section) if e.section else "", field(e)) for e in engines])
+
+    gauge("adld_axle_count", "Current axle count", lambda e: e.axle_count)
+    gauge("adld_target_count", "Current target (0 in COUNT mode)", lambda e: e.target_count)
+    gauge("adld_temperature_celsius", "Last axle temperature", lambda e: e.temperature)
+    gauge("adld_temperature_rate_celsius_per_minute", "Axle temperature rate of rise", lambda e: e.temperature_rate)
+    gauge("adld_match", "1 while the target is matched", lambda e: int(e.match_status))
+    if event_store:
+        metric("adld_events_written_total", "counter", "Event rows written to the store",
+               [("", event_store.written)])
+        metric("adld_events_dropped_total", "counter", "Events dropped because the store queue was full",
+               [("", event_store.dropped)])
+    metric("adld_log_written_total", "counter", "Log records written", [("", log.LOGGER.written)])
+    metric("adld_log_dropped_total", "counter", "Log records dropped because the writer fell behind",
+           [("", log.LOGGER.dropped)])
+    metric("adld_log_suppressed_total", "counter", "Log records refused by their category's rate limit",
+           [(_labels(category=category), n) for category, n in log.LOGGER.suppressed().items()])
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """Serves render() at /metrics on a local port from a daemon thread"""
+
+    def __init__(self, render, port=DEFAULT_PORT, host="127.0.0.1"):
+        # Only loaded when the endpoint is enabled
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.render = render
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?")[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+                body = self.render().encode()
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
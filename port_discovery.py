@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Auto-discovery of Arduino roles with a persisted port map.
+
+Every /dev/ttyUSB* and /dev/ttyACM* port is probed at the same time and
+identified by its READY banner or the prefix of its first message. The
+resulting role map is cached by USB serial number, so a normal start
+resolves ports from the cache without opening anything.
+"""
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+from serial.tools import list_ports
+
+import log
+
+BAUDRATE = 115200
+CACHE_PATH = os.environ.get("ADLD_PORT_MAP", os.path.expanduser("~/.config/adld_elb/port_map.json"))
+PORT_PATTERNS = ("/dev/ttyUSB*", "/dev/ttyACM*")
+ROLES = ("UNO", "NANO_TEMP", "NANO_LED")
+
+# Exact banners first, then message prefixes
+BANNERS = {
+    "UNO_READY": "UNO",
+    "NANO_READY": "NANO_TEMP",
+    "HOT_AXLE_ALERT": "NANO_TEMP",
+    "NANO_LED_READY": "NANO_LED",
+}
+PREFIXES = (
+    ("COUNT:", "UNO"),
+    ("MATCH:", "UNO"),
+    ("DEBUG:Count", "UNO"),
+    ("TEMP:", "NANO_TEMP"),
+    ("DEBUG:Temp", "NANO_TEMP"),
+    ("LED:", "NANO_LED"),
+)
+
+
+def classify_line(line):
+    role = BANNERS.get(line)
+    if role:
+        return role
+    for prefix, role in PREFIXES:
+        if line.startswith(prefix):
+            return role
+    return None
+
+
+def candidate_ports():
+    ports = []
+    for pattern in PORT_PATTERNS:
+        ports.extend(sorted(glob.glob(pattern)))
+    return ports
+
+
+def usb_key(info):
+    """Stable identity for a USB serial adapter.
+
+    CH340 clones have no serial number, so fall back to VID:PID plus the
+    physical USB location, which is stable as long as the cable stays in
+    the same socket.
+    """
+    if info.serial_number:
+        return info.serial_number
+    if info.vid is not None:
+        return f"{info.vid:04x}:{info.pid:04x}@{info.location}"
+    return info.device
+
+
+def port_keys():
+    """Map device path -> USB key for every candidate port present"""
+    wanted = set(candidate_ports())
+    keys = {info.device: usb_key(info) for info in list_ports.comports() if info.device in wanted}
+    for device in wanted:
+        keys.setdefault(device, device)
+    return keys
+
+
+def load_cache(path=CACHE_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(mapping, path=CACHE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(mapping, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def probe_port(device, listen_timeout=4.0, status_after=2.5, on_line=None):
+    """Open a port and return the role it announces, or None.
+
+    Boards that reset on open print their banner within ~2 s; boards that
+    didn't reset are asked for STATUS once the bootloader window has passed.
+    """
+    try:
+        port = serial.Serial(device, BAUDRATE, timeout=0.1)
+    except (OSError, serial.SerialException):
+        return None
+
+    try:
+        start = time.monotonic()
+        asked = False
+        while time.monotonic() - start < listen_timeout:
+            line = port.readline().decode("utf-8", errors="ignore").strip()
+            if line:
+                if on_line:
+                    on_line(device, line)
+                role = classify_line(line)
+                if role:
+                    return role
+            elif not asked and time.monotonic() - start >= status_after:
+                port.write(b"STATUS\n")
+                asked = True
+        return None
+    except (OSError, serial.SerialException):
+        return None
+    finally:
+        port.close()
+
+
+def probe_ports(devices, listen_timeout=4.0, on_line=None):
+    """Probe all devices concurrently; returns {device: role or None}"""
+    if not devices:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(devices)) as pool:
+        roles = pool.map(lambda d: probe_port(d, listen_timeout, on_line=on_line), devices)
+        return dict(zip(devices, roles))
+
+
+def discover(roles=ROLES, cache_path=CACHE_PATH, rescan=False, listen_timeout=4.0, on_line=None):
+    """Return {role: device path} for every role that could be found.
+
+    Ports whose USB key is in the cache are mapped without opening them;
+    only unknown ports are probed, and only if a role is still missing.
+    """
+    keys = port_keys()
+    cache = {} if rescan else load_cache(cache_path)
+
+    found = {}
+    for device, key in keys.items():
+        role = cache.get(key)
+        if role in roles and role not in found:
+            found[role] = device
+
+    missing = [role for role in roles if role not in found]
+    if not missing:
+        return found
+
+    unknown = [device for device in keys if device not in found.values()]
+    for device, role in probe_ports(unknown, listen_timeout, on_line).items():
+        if role in missing and role not in found:
+            found[role] = device
+            cache[keys[device]] = role
+
+    try:
+        save_cache(cache, cache_path)
+    except OSError as e:
+        log.warning("device", "could not save port map: %s", e)
+    return found
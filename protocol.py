@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Byte-level line framing and table-driven message dispatch.
+
+Frames are split straight out of the receive buffer and parsed from bytes
+(int()/float() accept ASCII bytes directly), so no line is ever decoded to
+str on the hot path.
+"""
+
+COUNT = "COUNT"
+MATCH = "MATCH"
+TEMP = "TEMP"
+LED = "LED"
+HOT_AXLE_ALERT = "HOT_AXLE_ALERT"
+UNO_READY = "UNO_READY"
+NANO_READY = "NANO_READY"
+NANO_LED_READY = "NANO_LED_READY"
+PROTO = "PROTO"
+
+_LED_STATES = {b"ON": "ON", b"OFF": "OFF"}
+
+
+def _parse_match(value):
+    return value.strip() == b"TRUE"
+
+
+def _parse_led(value):
+    value = value.strip()
+    return _LED_STATES.get(value) or value.decode("ascii", errors="ignore")
+
+
+def _parse_text(value):
+    return value.strip().decode("ascii", errors="ignore")
+
+
+def _no_value(value):
+    return None
+
+
+# tag -> value parser; banners carry no value
+PARSERS = {
+    COUNT: int,
+    MATCH: _parse_match,
+    TEMP: float,
+    LED: _parse_led,
+    HOT_AXLE_ALERT: _no_value,
+    UNO_READY: _no_value,
+    NANO_READY: _no_value,
+    NANO_LED_READY: _no_value,
+    PROTO: _parse_text,
+}
+
+
+class LineFramer:
+    """Accumulates raw bytes and yields complete newline-terminated frames"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        end = data.rfind(b"\n")
+        if end < 0:
+            self.buffer += data
+            return []
+        if self.buffer:
+            self.buffer += data[:end]
+            chunk = bytes(self.buffer)
+            self.buffer.clear()
+        else:
+            chunk = data[:end]
+        self.buffer += data[end + 1:]
+        if b"\r" in chunk:
+            chunk = chunk.replace(b"\r", b"")
+        frames = chunk.split(b"\n")
+        if b"" in frames:
+            frames = [frame for frame in frames if frame]
+        return frames
+
+    def reset(self):
+        self.buffer.clear()
+
+
+class Dispatcher:
+    """Parses a frame and calls the handler registered for its tag.
+
+    handlers maps a tag (COUNT, MATCH, ...) to handler(value). The table is
+    compiled once into bytes tag -> (parser, handler). Messages that arrive
+    already decoded (binary mode) go through deliver() instead.
+    """
+
+    def __init__(self, handlers):
+        self.handlers = dict(handlers)
+        self.table = {tag.encode(): (PARSERS[tag], handler) for tag, handler in handlers.items()}
+        self.unknown = 0
+        self.errors = 0
+
+    def dispatch(self, frame):
+        tag, _, value = frame.partition(b":")
+        entry = self.table.get(tag)
+        if entry is None:
+            self.unknown += 1
+            return False
+        parse, handler = entry
+        try:
+            value = parse(value)
+        except ValueError:
+            self.errors += 1
+            return False
+        handler(value)
+        return True
+
+    def deliver(self, tag, value):
+        handler = self.handlers.get(tag)
+        if handler is None:
+            self.unknown += 1
+            return False
+        handler(value)
+        return True
@@ -1,42 +1,69 @@
 #!/usr/bin/env python3
+from time import perf_counter_ns
+# Time to first frame is measured from here
+STARTED_NS = perf_counter_ns()
+
+import argparse
 import tkinter as tk
-from tkinter import font as tkfont, simpledialog
-import serial
-import threading
 import time
-from datetime import datetime
+
+import log
+# Only the defaults; each subsystem is imported when its option is used
+from defaults import DASHBOARD_PORT, EVENTS_PATH, METRICS_PORT, SHARED_STATE_NAME
+from engine import MAX_TARGET, AxleCounterEngine, run_headless
+from gui_state import GuiPump, StateStore, WidgetCache
+
+SPARKLINE_WIDTH = 160
+SPARKLINE_HEIGHT = 36
+
+# Digits in the circuit visualizer; counts past 10**DIGITS - 1 wrap there
+DIGITS = 4
+MAX_DIGITS = 6
+PLACE_NAMES = ("ONES", "TENS", "HUNDREDS", "THOUSANDS", "10 THOUSANDS", "100 THOUSANDS")
+# UNO pins driving each CD4511's A-D inputs, ones digit first
+BCD_PINS = ((2, 3, 4, 5), (10, 11, 12, 13))
 
 class RailwayAxleCounter:
-    def __init__(self, root):
+    def __init__(self, root, engine=None, show_visualizer=False, digits=DIGITS):
         self.root = root
+        self.digits = digits
         self.root.title("Railway Axle Counter System - ADLD Project")
         
         self.root.geometry("800x600")
         self.root.configure(bg='#1a1a2e')
         
-        # Variables
-        self.axle_count = 0
-        self.target_count = 0
-        self.temperature = 0.0
-        self.compare_mode = False
-        self.match_status = False
-        self.hot_axle = False
+        # Serial devices, protocol and state live in the engine
+        self.engine = engine or AxleCounterEngine()
         
-        # Serial ports
-        self.uno_serial = None
-        self.nano_temp_serial = None
-        self.nano_led_serial = None
-        self.serial_lock = threading.Lock()
+        # Engine threads write here; the pump applies it on the Tk thread
+        self.state = StateStore()
+        self.widgets = WidgetCache()
+        self.status_second = None
+        self.status_stamp = ""
+        
+        # The circuit visualizer is built the first time it is opened
+        self.visualizer_frame = None
+        self.visualizer_visible = False
+        self.scroll_job = None
+        self.first_frame_ms = None
+        self.mapped = False
         
         # Setup GUI
         self.setup_gui()
-        
-        # Connect to Arduinos
-        self.connect_arduinos()
-        
-        # Start serial reader threads
-        self.running = True
-        self.start_serial_threads()
+        self.root.bind("<Map>", self.on_map, add="+")
+        if show_visualizer:
+            self.toggle_visualizer()
+        self.gui_pump = GuiPump(self.root, self.state, self.apply_state_changes)
+        self.gui_pump.start()
+        self.metrics_job = None
+        self.refresh_metrics_overlay()
+        
+        # Subscribe, then open all Arduinos in the background
+        self.engine.subscribe(self.on_engine_changes)
+        self.engine.start()
+    
+    def on_engine_changes(self, changes):
+        self.state.set(**changes)
         
     def setup_gui(self):
         # Create main container with scrollbar
@@ -45,13 +72,13 @@ class RailwayAxleCounter:
         
         canvas = tk.Canvas(main_container, bg='#1a1a2e', highlightthickness=0)
         scrollbar = tk.Scrollbar(main_container, orient="vertical", command=canvas.yview)
+        self.scroll_canvas = canvas
         
         self.scrollable_frame = tk.Frame(canvas, bg='#1a1a2e')
         
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
+        # Every label that changes size re-configures the frame; recompute the
+        # scroll region once per idle pass instead of once per event
+        self.scrollable_frame.bind("<Configure>", self.schedule_scrollregion)
         
         canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
         canvas.configure(yscrollcommand=scrollbar.set)
@@ -59,11 +86,63 @@ class RailwayAxleCounter:
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
-        canvas.bind_all("<MouseWheel>", lambda e: canvas.yview_scroll(int(-1*(e.delta/120)), "units"))
+        # Bound on this window only, not on every widget of the application
+        self.root.bind("<MouseWheel>", self.on_mousewheel)
+        self.root.bind("<Button-4>", lambda e: canvas.yview_scroll(-1, "units"))
+        self.root.bind("<Button-5>", lambda e: canvas.yview_scroll(1, "units"))
         
         self.create_control_panel()
-        self.create_circuit_visualizer()
         
+        self.visualizer_button = tk.Button(
+            self.scrollable_frame,
+            text="▸ SHOW CIRCUIT VISUALIZER",
+            font=('Arial', 10, 'bold'),
+            bg='#0f3460',
+            fg='#ffffff',
+            activebackground='#1a3a5a',
+            command=self.toggle_visualizer
+        )
+        self.visualizer_button.pack(fill=tk.X, padx=10, pady=(0, 5))
+    
+    def schedule_scrollregion(self, event=None):
+        if self.scroll_job is None:
+            self.scroll_job = self.root.after_idle(self.update_scrollregion)
+    
+    def update_scrollregion(self):
+        self.scroll_job = None
+        self.scroll_canvas.configure(scrollregion=self.scroll_canvas.bbox("all"))
+    
+    def on_mousewheel(self, event):
+        self.scroll_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+    
+    def on_map(self, event):
+        # One-shot: later maps (restore after minimise) are not a first frame.
+        # The binding stays, since unbind() would drop other <Map> handlers too
+        if self.mapped or event.widget is not self.root:
+            return
+        self.mapped = True
+        # Mapped; the first frame is drawn once the pending redraws have run
+        self.root.after_idle(self.on_first_frame)
+    
+    def on_first_frame(self):
+        self.first_frame_ms = (perf_counter_ns() - STARTED_NS) / 1e6
+        log.info("gui", "first frame %.0f ms after start", self.first_frame_ms)
+    
+    def toggle_visualizer(self):
+        if self.visualizer_visible:
+            self.visualizer_frame.pack_forget()
+            self.visualizer_visible = False
+            self.visualizer_button.config(text="▸ SHOW CIRCUIT VISUALIZER")
+        else:
+            if self.visualizer_frame is None:
+                self.create_circuit_visualizer()
+            self.visualizer_frame.pack(fill=tk.X)
+            self.visualizer_visible = True
+            self.visualizer_button.config(text="▾ HIDE CIRCUIT VISUALIZER")
+            # Updates were skipped while it was hidden
+            self.update_circuit_visualizer()
+        self.schedule_scrollregion()
+    
     def create_control_panel(self):
         control_container = tk.Frame(self.scrollable_frame, bg='#1a1a2e')
         control_container.pack(fill=tk.X, padx=10, pady=5)
@@ -165,6 +244,26 @@ class RailwayAxleCounter:
         )
         self.hot_axle_label.pack()
         
+        # Sparkline of the temperature history; one line item, moved with coords()
+        self.sparkline_canvas = tk.Canvas(
+            temp_frame,
+            width=SPARKLINE_WIDTH,
+            height=SPARKLINE_HEIGHT,
+            bg='#0f1a30',
+            highlightthickness=0
+        )
+        self.sparkline_canvas.pack(pady=(3, 0))
+        self.sparkline = self.sparkline_canvas.create_line(0, 0, 0, 0, fill='#00aaff', width=1)
+        
+        self.temp_stats_label = tk.Label(
+            temp_frame,
+            text="",
+            font=('Arial', 8),
+            bg='#16213e',
+            fg='#aaaaaa'
+        )
+        self.temp_stats_label.pack(pady=(0, 3))
+        
         # LED Controller Status
         led_frame = tk.Frame(right_frame, bg='#16213e', relief=tk.RAISED, bd=2)
         led_frame.pack(fill=tk.X, pady=5)
@@ -245,11 +344,36 @@ class RailwayAxleCounter:
         )
         self.status_label.pack(fill=tk.X)
         
+        self.device_state_label = tk.Label(
+            control_container,
+            text="",
+            font=('Arial', 8),
+            bg='#0f3460',
+            fg='#aaaaaa',
+            anchor=tk.W
+        )
+        self.device_state_label.pack(fill=tk.X)
+        
+        # Latency / error overlay, refreshed once a second
+        self.metrics_label = tk.Label(
+            control_container,
+            text="",
+            font=('Courier', 8),
+            bg='#0f3460',
+            fg='#777777',
+            anchor=tk.W
+        )
+        self.metrics_label.pack(fill=tk.X)
+        
         tk.Frame(self.scrollable_frame, height=3, bg='#e94560').pack(fill=tk.X, pady=10)
     
     def create_circuit_visualizer(self):
+        from seven_segment import DigitRow, SevenSegmentDisplay
+        
+        self.visualizer_frame = tk.Frame(self.scrollable_frame, bg='#1a1a2e')
+        
         # Circuit title
-        circuit_title = tk.Frame(self.scrollable_frame, bg='#0f3460')
+        circuit_title = tk.Frame(self.visualizer_frame, bg='#0f3460')
         circuit_title.pack(fill=tk.X, padx=10, pady=5)
         
         tk.Label(
@@ -260,7 +384,7 @@ class RailwayAxleCounter:
             fg='#ffffff'
         ).pack(pady=8)
         
-        circuit_frame = tk.Frame(self.scrollable_frame, bg='#16213e', relief=tk.RAISED, bd=3)
+        circuit_frame = tk.Frame(self.visualizer_frame, bg='#16213e', relief=tk.RAISED, bd=3)
         circuit_frame.pack(fill=tk.BOTH, padx=10, pady=5)
         
         # Conversion section
@@ -275,43 +399,30 @@ class RailwayAxleCounter:
             fg='#00ff88'
         ).pack(pady=5)
         
-        # Tens digit
-        tens_frame = tk.Frame(conversion_frame, bg='#1a2332')
-        tens_frame.pack(pady=5)
-        
-        tk.Label(tens_frame, text="TENS DIGIT:", font=('Arial', 11, 'bold'), bg='#1a2332', fg='#ffffff').pack(side=tk.LEFT, padx=5)
-        
-        self.tens_decimal_label = tk.Label(tens_frame, text="0", font=('Arial', 18, 'bold'), bg='#000000', fg='#00ff00', width=3, relief=tk.SUNKEN, bd=2)
-        self.tens_decimal_label.pack(side=tk.LEFT, padx=5)
-        
-        tk.Label(tens_frame, text="→", font=('Arial', 16, 'bold'), bg='#1a2332', fg='#ffaa00').pack(side=tk.LEFT, padx=5)
-        
-        self.tens_bcd_labels = []
-        for i in range(4):
-            label = tk.Label(tens_frame, text="0", font=('Arial', 16, 'bold'), bg='#000000', fg='#ff0000', width=2, relief=tk.RAISED, bd=3)
-            label.pack(side=tk.LEFT, padx=2)
-            self.tens_bcd_labels.append(label)
-        
-        tk.Label(tens_frame, text="D C B A", font=('Arial', 9), bg='#1a2332', fg='#888888').pack(side=tk.LEFT, padx=5)
-        
-        # Ones digit
-        ones_frame = tk.Frame(conversion_frame, bg='#1a2332')
-        ones_frame.pack(pady=5)
-        
-        tk.Label(ones_frame, text="ONES DIGIT:", font=('Arial', 11, 'bold'), bg='#1a2332', fg='#ffffff').pack(side=tk.LEFT, padx=5)
-        
-        self.ones_decimal_label = tk.Label(ones_frame, text="0", font=('Arial', 18, 'bold'), bg='#000000', fg='#00ff00', width=3, relief=tk.SUNKEN, bd=2)
-        self.ones_decimal_label.pack(side=tk.LEFT, padx=5)
-        
-        tk.Label(ones_frame, text="→", font=('Arial', 16, 'bold'), bg='#1a2332', fg='#ffaa00').pack(side=tk.LEFT, padx=5)
-        
-        self.ones_bcd_labels = []
-        for i in range(4):
-            label = tk.Label(ones_frame, text="0", font=('Arial', 16, 'bold'), bg='#000000', fg='#ff0000', width=2, relief=tk.RAISED, bd=3)
-            label.pack(side=tk.LEFT, padx=2)
-            self.ones_bcd_labels.append(label)
-        
-        tk.Label(ones_frame, text="D C B A", font=('Arial', 9), bg='#1a2332', fg='#888888').pack(side=tk.LEFT, padx=5)
+        # One row per digit, most significant first
+        self.decimal_labels = [None] * self.digits
+        self.bcd_labels = [None] * 4 * self.digits
+        for index in reversed(range(self.digits)):
+            digit_frame = tk.Frame(conversion_frame, bg='#1a2332')
+            digit_frame.pack(pady=5)
+            
+            tk.Label(digit_frame, text=f"{PLACE_NAMES[index]}:", font=('Arial', 11, 'bold'), bg='#1a2332', fg='#ffffff', width=12, anchor=tk.E).pack(side=tk.LEFT, padx=5)
+            
+            label = tk.Label(digit_frame, text="0", font=('Arial', 18, 'bold'), bg='#000000', fg='#00ff00', width=3, relief=tk.SUNKEN, bd=2)
+            label.pack(side=tk.LEFT, padx=5)
+            self.decimal_labels[index] = label
+            
+            tk.Label(digit_frame, text="→", font=('Arial', 16, 'bold'), bg='#1a2332', fg='#ffaa00').pack(side=tk.LEFT, padx=5)
+            
+            # D C B A: bit 3 first. Created in the zero-bit style, since
+            # update_circuit_visualizer only restyles bits that change
+            for bit in reversed(range(4)):
+                label = tk.Label(digit_frame, text="0", font=('Arial', 16, 'bold'), bg='#330000', fg='#ff0000', width=2, relief=tk.RAISED, bd=3)
+                label.pack(side=tk.LEFT, padx=2)
+                self.bcd_labels[4 * index + bit] = label
+            
+            tk.Label(digit_frame, text="D C B A", font=('Arial', 9), bg='#1a2332', fg='#888888').pack(side=tk.LEFT, padx=5)
+        self.visualizer_bcd = 0
         
         # Decoder
         decoder_frame = tk.Frame(circuit_frame, bg='#1a2332', relief=tk.GROOVE, bd=2)
@@ -329,17 +440,16 @@ class RailwayAxleCounter:
         displays_frame = tk.Frame(display_container, bg='#000000')
         displays_frame.pack()
         
-        tens_display_frame = tk.Frame(displays_frame, bg='#000000')
-        tens_display_frame.pack(side=tk.LEFT, padx=20)
-        tk.Label(tens_display_frame, text="TENS", font=('Arial', 10, 'bold'), bg='#000000', fg='#888888').pack()
-        self.tens_canvas = tk.Canvas(tens_display_frame, width=100, height=150, bg='#000000', highlightthickness=0)
-        self.tens_canvas.pack(pady=10)
-        
-        ones_display_frame = tk.Frame(displays_frame, bg='#000000')
-        ones_display_frame.pack(side=tk.LEFT, padx=20)
-        tk.Label(ones_display_frame, text="ONES", font=('Arial', 10, 'bold'), bg='#000000', fg='#888888').pack()
-        self.ones_canvas = tk.Canvas(ones_display_frame, width=100, height=150, bg='#000000', highlightthickness=0)
-        self.ones_canvas.pack(pady=10)
+        displays = [None] * self.digits
+        padx = 20 if self.digits <= 4 else 5
+        for index in reversed(range(self.digits)):
+            display_frame = tk.Frame(displays_frame, bg='#000000')
+            display_frame.pack(side=tk.LEFT, padx=padx)
+            tk.Label(display_frame, text=PLACE_NAMES[index], font=('Arial', 10, 'bold'), bg='#000000', fg='#888888').pack()
+            digit_canvas = tk.Canvas(display_frame, width=100, height=150, bg='#000000', highlightthickness=0)
+            digit_canvas.pack(pady=10)
+            displays[index] = SevenSegmentDisplay(digit_canvas)
+        self.digit_row = DigitRow(displays)
         
         # Pin mapping
         pin_frame = tk.Frame(circuit_frame, bg='#1a2332', relief=tk.GROOVE, bd=2)
@@ -350,289 +460,157 @@ class RailwayAxleCounter:
         pin_info = tk.Frame(pin_frame, bg='#1a2332')
         pin_info.pack(pady=5)
         
-        left_pins = tk.Frame(pin_info, bg='#1a2332')
-        left_pins.pack(side=tk.LEFT, padx=20)
-        tk.Label(left_pins, text="ONES DIGIT BCD:", font=('Arial', 9, 'bold'), bg='#1a2332', fg='#ffaa00').pack(anchor=tk.W)
-        tk.Label(left_pins, text="Pin D2 → A (bit 0)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(left_pins, text="Pin D3 → B (bit 1)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(left_pins, text="Pin D4 → C (bit 2)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(left_pins, text="Pin D5 → D (bit 3)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        
-        right_pins = tk.Frame(pin_info, bg='#1a2332')
-        right_pins.pack(side=tk.LEFT, padx=20)
-        tk.Label(right_pins, text="TENS DIGIT BCD:", font=('Arial', 9, 'bold'), bg='#1a2332', fg='#ffaa00').pack(anchor=tk.W)
-        tk.Label(right_pins, text="Pin D10 → A (bit 0)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(right_pins, text="Pin D11 → B (bit 1)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(right_pins, text="Pin D12 → C (bit 2)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
-        tk.Label(right_pins, text="Pin D13 → D (bit 3)", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
+        for index in range(self.digits):
+            pins = tk.Frame(pin_info, bg='#1a2332')
+            pins.pack(side=tk.LEFT, padx=20 if self.digits <= 2 else 8, anchor=tk.N)
+            tk.Label(pins, text=f"{PLACE_NAMES[index]} DIGIT BCD:", font=('Arial', 9, 'bold'), bg='#1a2332', fg='#ffaa00').pack(anchor=tk.W)
+            if index < len(BCD_PINS):
+                for bit, pin in enumerate(BCD_PINS[index]):
+                    tk.Label(pins, text=f"Pin D{pin} → {'ABCD'[bit]} (bit {bit})", font=('Arial', 9), bg='#1a2332', fg='#ffffff').pack(anchor=tk.W)
+            else:
+                tk.Label(pins, text="not wired on the UNO", font=('Arial', 9), bg='#1a2332', fg='#888888').pack(anchor=tk.W)
         
         # Project info
-        info_frame = tk.Frame(self.scrollable_frame, bg='#0f3460', relief=tk.RAISED, bd=2)
+        info_frame = tk.Frame(self.visualizer_frame, bg='#0f3460', relief=tk.RAISED, bd=2)
         info_frame.pack(fill=tk.X, padx=10, pady=10)
         
         tk.Label(info_frame, text="ADLD (Advanced Digital Logic Design) Project", font=('Arial', 11, 'bold'), bg='#0f3460', fg='#ffffff').pack(pady=3)
         tk.Label(info_frame, text="Railway Axle Counter with BCD Display, Temperature Monitoring & Serial LED Alert", font=('Arial', 9), bg='#0f3460', fg='#aaaaaa').pack(pady=2)
     
-    def draw_seven_segment(self, canvas, digit, color='#ff0000'):
-        canvas.delete("all")
-        
-        segments = {
-            'a': [(20, 10, 80, 10), (25, 5, 75, 15)],
-            'b': [(80, 10, 80, 60), (75, 15, 85, 55)],
-            'c': [(80, 70, 80, 120), (75, 75, 85, 115)],
-            'd': [(20, 120, 80, 120), (25, 115, 75, 125)],
-            'e': [(20, 70, 20, 120), (15, 75, 25, 115)],
-            'f': [(20, 10, 20, 60), (15, 15, 25, 55)],
-            'g': [(20, 65, 80, 65), (25, 60, 75, 70)]
-        }
-        
-        patterns = {
-            0: ['a', 'b', 'c', 'd', 'e', 'f'],
-            1: ['b', 'c'],
-            2: ['a', 'b', 'd', 'e', 'g'],
-            3: ['a', 'b', 'c', 'd', 'g'],
-            4: ['b', 'c', 'f', 'g'],
-            5: ['a', 'c', 'd', 'f', 'g'],
-            6: ['a', 'c', 'd', 'e', 'f', 'g'],
-            7: ['a', 'b', 'c'],
-            8: ['a', 'b', 'c', 'd', 'e', 'f', 'g'],
-            9: ['a', 'b', 'c', 'd', 'f', 'g']
-        }
-        
-        active_segments = patterns.get(digit, [])
-        
-        for seg_name, coords in segments.items():
-            if seg_name in active_segments:
-                canvas.create_polygon(coords[1], fill=color, outline=color, width=2)
-            else:
-                canvas.create_polygon(coords[1], fill='#1a1a1a', outline='#333333', width=1)
-    
     def update_circuit_visualizer(self):
-        tens = (self.axle_count // 10) % 10
-        ones = self.axle_count % 10
-        
-        self.tens_decimal_label.config(text=str(tens))
-        self.ones_decimal_label.config(text=str(ones))
-        
-        for i in range(4):
-            bit_value = (tens >> i) & 1
-            self.tens_bcd_labels[i].config(
-                text=str(bit_value),
-                fg='#00ff00' if bit_value else '#ff0000',
-                bg='#003300' if bit_value else '#330000'
+        # Segments and BCD for the whole count in one go; only changed
+        # digits and bits are touched
+        bcd = self.digit_row.set_value(self.engine.axle_count)
+        changed = bcd ^ self.visualizer_bcd
+        self.visualizer_bcd = bcd
+        widgets = self.widgets
+        
+        digits = changed
+        while digits:
+            index = ((digits & -digits).bit_length() - 1) // 4
+            widgets.config(self.decimal_labels[index], text=str(bcd >> 4 * index & 0xF))
+            digits &= ~(0xF << 4 * index)
+        
+        while changed:
+            bit = changed & -changed
+            on = bcd & bit
+            widgets.config(
+                self.bcd_labels[bit.bit_length() - 1],
+                text='1' if on else '0',
+                fg='#00ff00' if on else '#ff0000',
+                bg='#003300' if on else '#330000'
             )
-            
-            bit_value = (ones >> i) & 1
-            self.ones_bcd_labels[i].config(
-                text=str(bit_value),
-                fg='#00ff00' if bit_value else '#ff0000',
-                bg='#003300' if bit_value else '#330000'
-            )
-        
-        self.draw_seven_segment(self.tens_canvas, tens)
-        self.draw_seven_segment(self.ones_canvas, ones)
-    
-    def connect_arduinos(self):
-        """Connect to all three Arduinos via USB"""
-        
-        # Try to find and connect to each Arduino
-        # UNO typically: /dev/ttyACM0
-        # Nano #1 (Temp): /dev/ttyUSB0
-        # Nano #2 (LED): /dev/ttyUSB1
-        
-        UNO_PORT = '/dev/ttyACM0'
-        NANO_TEMP_PORT = '/dev/ttyUSB0'
-        NANO_LED_PORT = '/dev/ttyUSB1'
-        
-        # Connect to UNO
-        try:
-            self.uno_serial = serial.Serial(UNO_PORT, 115200, timeout=1)
-            time.sleep(2)
-            self.update_status(f"✓ UNO connected on {UNO_PORT}")
-            print(f"UNO connected: {UNO_PORT}")
-        except Exception as e:
-            self.update_status(f"✗ UNO connection failed: {e}")
-            print(f"UNO error: {e}")
-        
-        # Connect to Nano #1 (Temperature)
-        try:
-            self.nano_temp_serial = serial.Serial(NANO_TEMP_PORT, 115200, timeout=1)
-            time.sleep(2)
-            self.update_status(f"✓ Nano Temp connected on {NANO_TEMP_PORT}")
-            print(f"Nano Temp connected: {NANO_TEMP_PORT}")
-        except Exception as e:
-            self.update_status(f"✗ Nano Temp connection failed: {e}")
-            print(f"Nano Temp error: {e}")
-        
-        # Connect to Nano #2 (LED Controller)
-        try:
-            self.nano_led_serial = serial.Serial(NANO_LED_PORT, 115200, timeout=1)
-            time.sleep(2)
-            self.update_status(f"✓ Nano LED connected on {NANO_LED_PORT}")
-            print(f"Nano LED connected: {NANO_LED_PORT}")
-        except Exception as e:
-            self.update_status(f"✗ Nano LED connection failed: {e}")
-            print(f"Nano LED error: {e}")
-    
-    def start_serial_threads(self):
-        if self.uno_serial:
-            uno_thread = threading.Thread(target=self.read_uno_serial, daemon=True)
-            uno_thread.start()
-        
-        if self.nano_temp_serial:
-            nano_temp_thread = threading.Thread(target=self.read_nano_temp_serial, daemon=True)
-            nano_temp_thread.start()
-        
-        if self.nano_led_serial:
-            nano_led_thread = threading.Thread(target=self.read_nano_led_serial, daemon=True)
-            nano_led_thread.start()
-    
-    def read_uno_serial(self):
-        while self.running:
-            try:
-                if self.uno_serial and self.uno_serial.in_waiting:
-                    line = self.uno_serial.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        print(f"UNO → {line}")
-                        self.process_uno_message(line)
-            except Exception as e:
-                print(f"UNO read error: {e}")
-            time.sleep(0.01)
-    
-    def read_nano_temp_serial(self):
-        while self.running:
-            try:
-                if self.nano_temp_serial and self.nano_temp_serial.in_waiting:
-                    line = self.nano_temp_serial.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        print(f"NANO_TEMP → {line}")
-                        self.process_nano_temp_message(line)
-            except Exception as e:
-                print(f"Nano Temp read error: {e}")
-            time.sleep(0.01)
-    
-    def read_nano_led_serial(self):
-        while self.running:
-            try:
-                if self.nano_led_serial and self.nano_led_serial.in_waiting:
-                    line = self.nano_led_serial.readline().decode('utf-8', errors='ignore').strip()
-                    if line:
-                        print(f"NANO_LED → {line}")
-                        self.process_nano_led_message(line)
-            except Exception as e:
-                print(f"Nano LED read error: {e}")
-            time.sleep(0.01)
-    
-    def process_uno_message(self, msg):
-        if msg.startswith("COUNT:"):
-            self.axle_count = int(msg.split(":")[1])
-            self.update_count_display()
-            self.update_circuit_visualizer()
-        elif msg.startswith("MATCH:"):
-            match = (msg.split(":")[1] == "TRUE")
-            if match and not self.match_status:
-                # Target just reached!
-                self.match_status = True
-                self.update_match_display()
-                self.send_to_led_nano("TARGET_REACHED\n")
-                self.update_status("🎯 TARGET REACHED - Signal sent to LED Nano!")
-            elif not match:
-                self.match_status = False
-                self.update_match_display()
-        elif msg == "UNO_READY":
-            self.update_status("UNO Ready")
-            self.update_circuit_visualizer()
+            changed ^= bit
     
-    def process_nano_temp_message(self, msg):
-        if msg.startswith("TEMP:"):
-            try:
-                temp_value = float(msg.split(":")[1])
-                self.temperature = temp_value
-            # Schedule GUI update on main thread
-                self.root.after(0, self.update_temp_display)
-            except Exception as e:
-                print(f"Error parsing temperature: {e}")
-        elif msg == "HOT_AXLE_ALERT":
-            self.hot_axle = True
-            self.root.after(0, self.update_temp_display)
-        elif msg == "NANO_READY":
-            self.root.after(0, lambda: self.update_status("Nano Temp Ready"))
-    
-    def process_nano_led_message(self, msg):
-        if msg.startswith("LED:"):
-            led_state = msg.split(":")[1]
-            self.update_led_status(led_state)
-        elif msg == "NANO_LED_READY":
-            self.update_status("Nano LED Ready")
-            self.led_status_label.config(text="Connected", fg='#00ff00')
+    def apply_state_changes(self, changes):
+        """Runs on the Tk thread with the latest value of each changed field"""
+        if "axle_count" in changes:
+            self.update_count_display()
+            if self.visualizer_visible:
+                self.update_circuit_visualizer()
+            arrival_ns = self.engine.count_arrival_ns
+            if arrival_ns:
+                self.engine.metrics.gui.observe_ns(perf_counter_ns() - arrival_ns)
+        if "match_status" in changes:
+            self.update_match_display()
+        if "temperature" in changes or "hot_axle" in changes or "rising_alarm" in changes:
+            self.update_temp_display()
+        if changes.get("temperature_view"):
+            self.update_temp_history(changes["temperature_view"])
+        if "led_state" in changes:
+            self.update_led_status(changes["led_state"])
+        if "compare_mode" in changes or "target_count" in changes:
+            self.update_mode_display()
+            self.update_count_display()
+            self.update_match_display()
+        if "device_states" in changes:
+            summary = "   ".join(f"{name}: {state}" for name, state in changes["device_states"].items())
+            self.widgets.config(self.device_state_label, text=summary)
+        if "status" in changes:
+            self.update_status(changes["status"])
     
     def update_count_display(self):
-        self.count_label.config(text=f"{self.axle_count:02d}")
-        
-        if self.compare_mode and self.target_count > 0:
-            if self.axle_count == self.target_count:
-                self.count_label.config(fg='#00ff00')
-            elif self.axle_count > self.target_count:
-                self.count_label.config(fg='#ff0000')
+        if self.engine.compare_mode and self.engine.target_count > 0:
+            if self.engine.axle_count == self.engine.target_count:
+                color = '#00ff00'
+            elif self.engine.axle_count > self.engine.target_count:
+                color = '#ff0000'
             else:
-                self.count_label.config(fg='#ffaa00')
+                color = '#ffaa00'
         else:
-            self.count_label.config(fg='#00ff00')
+            color = '#00ff00'
+        self.widgets.config(self.count_label, text=f"{self.engine.axle_count:02d}", fg=color)
     
     def update_temp_display(self):
-        if self.temperature > -50:
-            self.temp_label.config(text=f"{self.temperature:.1f}°C")
-            
-            if self.temperature > 80:
-                self.temp_label.config(fg='#ff0000')
-                self.hot_axle_label.config(text="⚠️ HOT AXLE!")
-            elif self.temperature > 60:
-                self.temp_label.config(fg='#ffaa00')
-                self.hot_axle_label.config(text="Warning")
+        if self.engine.temperature > -50:
+            if self.engine.temperature > 80:
+                color, alert = '#ff0000', "⚠️ HOT AXLE!"
+            elif self.engine.rising_alarm:
+                color, alert = '#ff6600', f"⚠️ RISING {self.engine.temperature_rate:+.1f}°C/min"
+            elif self.engine.temperature > 60:
+                color, alert = '#ffaa00', "Warning"
             else:
-                self.temp_label.config(fg='#00aaff')
-                self.hot_axle_label.config(text="Normal")
+                color, alert = '#00aaff', "Normal"
+            self.widgets.config(self.temp_label, text=f"{self.engine.temperature:.1f}°C", fg=color)
+            self.widgets.config(self.hot_axle_label, text=alert)
         else:
-            self.temp_label.config(text="--°C")
-            self.hot_axle_label.config(text="No sensor")
+            self.widgets.config(self.temp_label, text="--°C")
+            self.widgets.config(self.hot_axle_label, text="No sensor")
+    
+    def update_temp_history(self, history):
+        """Draw a TemperatureView published by the engine"""
+        self.widgets.config(
+            self.temp_stats_label,
+            text=f"min {history.min:.1f}  max {history.max:.1f}  avg {history.mean:.1f}  {self.engine.temperature_rate:+.1f}°C/min"
+        )
+        
+        view = history.points
+        if len(view) < 2:
+            return
+        low = min(view)
+        span = max(max(view) - low, 1.0)
+        x_step = (SPARKLINE_WIDTH - 1) / (len(view) - 1)
+        coords = []
+        for i, value in enumerate(view):
+            coords.append(i * x_step)
+            coords.append(SPARKLINE_HEIGHT - 2 - (value - low) / span * (SPARKLINE_HEIGHT - 4))
+        self.sparkline_canvas.coords(self.sparkline, *coords)
+        color = '#ff0000' if history.latest > 80 else '#ff6600' if self.engine.rising_alarm else '#00aaff'
+        self.widgets.itemconfig(self.sparkline_canvas, self.sparkline, fill=color)
     
     def update_match_display(self):
-        if self.match_status and self.compare_mode:
-            self.match_label.config(text="✓ MATCH!", fg='#00ff00')
+        if self.engine.match_status and self.engine.compare_mode:
+            self.widgets.config(self.match_label, text="✓ MATCH!", fg='#00ff00')
         else:
-            self.match_label.config(text="")
+            self.widgets.config(self.match_label, text="")
     
     def update_led_status(self, state):
         """Update LED status indicator in GUI"""
         if state == "ON":
-            self.led_status_label.config(text="🔴 ON", fg='#ff0000')
+            self.widgets.config(self.led_status_label, text="🔴 ON", fg='#ff0000')
+        elif state == "CONNECTED":
+            self.widgets.config(self.led_status_label, text="Connected", fg='#00ff00')
+        else:
+            self.widgets.config(self.led_status_label, text="OFF", fg='#888888')
+    
+    def update_mode_display(self):
+        if self.engine.compare_mode:
+            self.widgets.config(self.mode_button, text="COMPARE", bg='#e94560')
+            self.widgets.config(self.target_label, text=f"{self.engine.target_count:02d}")
         else:
-            self.led_status_label.config(text="OFF", fg='#888888')
+            self.widgets.config(self.mode_button, text="COUNT", bg='#0f3460')
+            self.widgets.config(self.target_label, text="--")
     
     def toggle_mode(self):
-        if not self.compare_mode:
+        if not self.engine.compare_mode:
             target = self.show_target_entry_dialog()
             
             if target is not None:
-                self.compare_mode = True
-                self.target_count = target
-                self.target_label.config(text=f"{target:02d}")
-                self.mode_button.config(text="COMPARE", bg='#e94560')
-                self.send_to_uno("MODE:COMPARE\n")
-                self.send_to_uno(f"TARGET:{target}\n")
-                self.update_status(f"Compare mode - Target: {target}")
+                self.engine.set_compare_mode(target)
             else:
                 self.update_status("Cancelled - staying in COUNT mode")
         else:
-            self.compare_mode = False
-            self.mode_button.config(text="COUNT", bg='#0f3460')
-            self.send_to_uno("MODE:COUNT\n")
-            self.match_label.config(text="")
-            self.target_label.config(text="--")
-            self.target_count = 0
-            self.match_status = False
-            self.send_to_led_nano("RESET\n")
-            self.update_status("Count mode - no target")
+            self.engine.set_count_mode()
     
     def show_target_entry_dialog(self):
         dialog = tk.Toplevel(self.root)
@@ -664,11 +642,11 @@ class RailwayAxleCounter:
         def submit():
             try:
                 value = int(entry.get())
-                if 1 <= value <= 99:
+                if 1 <= value <= MAX_TARGET:
                     result[0] = value
                     dialog.destroy()
                 else:
-                    error_label.config(text="Please enter 1-99")
+                    error_label.config(text=f"Please enter 1-{MAX_TARGET}")
             except ValueError:
                 error_label.config(text="Invalid number")
         
@@ -688,50 +666,125 @@ class RailwayAxleCounter:
         return result[0]
     
     def reset_count(self):
-        self.send_to_uno("RESET\n")
-        self.send_to_led_nano("RESET\n")
-        self.axle_count = 0
-        self.match_status = False
-        self.update_count_display()
-        self.update_circuit_visualizer()
-        self.match_label.config(text="")
-        self.update_status("✓ Count reset to 0")
-    
-    def send_to_uno(self, message):
-        try:
-            if self.uno_serial:
-                with self.serial_lock:
-                    self.uno_serial.write(message.encode())
-                    print(f"SENT TO UNO: {message.strip()}")
-        except Exception as e:
-            self.update_status(f"UNO send error: {e}")
-    
-    def send_to_led_nano(self, message):
-        """Send command to LED Nano controller"""
-        try:
-            if self.nano_led_serial:
-                with self.serial_lock:
-                    self.nano_led_serial.write(message.encode())
-                    print(f"SENT TO NANO_LED: {message.strip()}")
-        except Exception as e:
-            self.update_status(f"Nano LED send error: {e}")
+        self.engine.reset_count()
     
     def update_status(self, message):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        self.status_label.config(text=f"[{timestamp}] {message}")
+        # Statuses arrive in bursts; format the clock once per second
+        second = int(time.time())
+        if second != self.status_second:
+            self.status_second = second
+            self.status_stamp = time.strftime("%H:%M:%S", time.localtime(second))
+        self.widgets.config(self.status_label, text=f"[{self.status_stamp}] {message}")
+    
+    def refresh_metrics_overlay(self):
+        counters = self.engine.port_counters().values()
+        messages = sum(c["messages"] for c in counters)
+        errors = sum(c["parse_errors"] + c["frames_lost"] for c in counters)
+        pump = self.gui_pump
+        frame_ms = pump.busy_ns / pump.frames / 1e6 if pump.frames else 0.0
+        first_frame = f"  first frame {self.first_frame_ms:.0f} ms" if self.first_frame_ms else ""
+        self.metrics_label.config(
+            text=f"{self.engine.metrics.summary()}   msgs {messages}  err {errors}   "
+                 f"{self.widgets.summary()}  apply {frame_ms:.2f} ms/frame{first_frame}")
+        self.metrics_job = self.root.after(1000, self.refresh_metrics_overlay)
     
     def on_closing(self):
-        self.running = False
-        if self.uno_serial:
-            self.uno_serial.close()
-        if self.nano_temp_serial:
-            self.nano_temp_serial.close()
-        if self.nano_led_serial:
-            self.nano_led_serial.close()
+        if self.metrics_job:
+            self.root.after_cancel(self.metrics_job)
+        if self.scroll_job:
+            self.root.after_cancel(self.scroll_job)
+        self.gui_pump.stop()
+        self.engine.unsubscribe(self.on_engine_changes)
+        self.engine.stop()
         self.root.destroy()
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="Railway Axle Counter - ADLD Project")
+    parser.add_argument("--headless", action="store_true", help="run the counting engine without the Tk window")
+    parser.add_argument("--target", type=int, help="start in COMPARE mode with this target (headless only)")
+    parser.add_argument("--record", metavar="LOG", help="capture all serial traffic to LOG for traffic_log.py replay")
+    parser.add_argument("--sections", metavar="FILE", help="supervise every track section in FILE (see sections.py)")
+    parser.add_argument("--uno", metavar="PORT", help="UNO serial port (skips discovery for it)")
+    parser.add_argument("--nano-temp", metavar="PORT", help="temperature Nano serial port")
+    parser.add_argument("--nano-led", metavar="PORT", help="LED Nano serial port")
+    parser.add_argument("--events", metavar="DB", default=EVENTS_PATH, help=f"event store for counts, matches and temperatures (default {EVENTS_PATH})")
+    parser.add_argument("--no-events", action="store_true", help="don't persist events")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help=f"local Prometheus endpoint port, 0 to disable (default {METRICS_PORT})")
+    parser.add_argument("--dashboard-port", type=int, default=0, help=f"serve a live browser dashboard on the LAN, e.g. {DASHBOARD_PORT}")
+    parser.add_argument("--shared-state", metavar="NAME", default=SHARED_STATE_NAME, help=f"publish state to shared memory for local readers (default {SHARED_STATE_NAME}, see shared_state.py)")
+    parser.add_argument("--no-shared-state", action="store_true", help="don't publish state to shared memory")
+    parser.add_argument("--engine-process", action="store_true", help="run serial I/O and the engine in a supervised worker process (see engine_process.py)")
+    parser.add_argument("--engine-cpu", type=int, metavar="CPU", help="pin the engine process to this core (implies --engine-process)")
+    parser.add_argument("--visualizer", action="store_true", help="open the circuit visualizer at startup")
+    parser.add_argument("--digits", type=int, choices=range(1, MAX_DIGITS + 1), default=DIGITS, metavar="N",
+                        help=f"digits in the circuit visualizer, 1-{MAX_DIGITS} (default {DIGITS})")
+    log.add_arguments(parser)
+    args = parser.parse_args()
+    log.configure(level=args.log_level, fmt=args.log_format)
+    
+    ports = {role: port for role, port in (("UNO", args.uno), ("NANO_TEMP", args.nano_temp), ("NANO_LED", args.nano_led)) if port}
+    
+    events = None if args.no_events else args.events
+    shared_state = None if args.no_shared_state else args.shared_state
+    
+    if args.sections:
+        run_sections(args, events, shared_state)
+        return
+    
+    if args.headless:
+        run_headless(target=args.target, ports=ports, record=args.record, metrics_port=args.metrics_port, events=events,
+                     dashboard_port=args.dashboard_port, shared_state=shared_state)
+        return
+    
+    if args.engine_process or args.engine_cpu is not None:
+        from engine_process import RemoteEngine
+        engine = RemoteEngine(ports, cpu=args.engine_cpu)
+    else:
+        engine = AxleCounterEngine(ports)
+    if shared_state:
+        engine.share_state(shared_state)
+    if args.record:
+        engine.record_to(args.record)
+    if events:
+        engine.store_events(events)
+    if args.metrics_port:
+        engine.serve_metrics(args.metrics_port)
+    if args.dashboard_port:
+        engine.serve_dashboard(args.dashboard_port)
+    
+    log.install_dump_signal()
     root = tk.Tk()
-    app = RailwayAxleCounter(root)
+    app = RailwayAxleCounter(root, engine, show_visualizer=args.visualizer, digits=args.digits)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+
+def run_sections(args, events, shared_state):
+    from sections import SectionManager, load_sections, run_headless as run_sections_headless
+    
+    configs = load_sections(args.sections)
+    if args.headless:
+        run_sections_headless(configs, metrics_port=args.metrics_port, events=events,
+                              dashboard_port=args.dashboard_port, shared_state=shared_state, record=args.record)
+        return
+    
+    from section_overview import SectionOverview
+    manager = SectionManager(configs)
+    if args.record:
+        manager.record_to(args.record)
+    if shared_state:
+        manager.share_state(shared_state)
+    if events:
+        manager.store_events(events)
+    if args.metrics_port:
+        manager.serve_metrics(args.metrics_port)
+    if args.dashboard_port:
+        manager.serve_dashboard(args.dashboard_port)
+    
+    log.install_dump_signal()
+    root = tk.Tk()
+    overview = SectionOverview(root, manager)
+    root.protocol("WM_DELETE_WINDOW", overview.on_closing)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Compact overview grid of every track section.
+
+One tile per section shows count/target, match state, temperature, LED
+and a dot per board. All sections feed one StateStore (fields are keyed
+"section/field") drained by a single GuiPump, so the Tk cost per frame
+depends on what changed, not on how many sections exist, and a shared
+WidgetCache drops configures that would not change anything.
+"""
+import math
+import tkinter as tk
+
+from engine import ROLES
+from gui_state import GuiPump, StateStore, WidgetCache
+
+TILE_COLUMNS = 4
+STATE_COLORS = {
+    "ready": '#00ff00',
+    "waiting": '#ffaa00',
+    "connecting": '#ffaa00',
+    "discovering": '#ffaa00',
+    "failed": '#ff0000',
+    "lost": '#ff0000',
+    "absent": '#444444',
+}
+
+
+class SectionTile:
+    def __init__(self, parent, name, widgets):
+        self.widgets = widgets
+        self.frame = tk.Frame(parent, bg='#16213e', relief=tk.RAISED, bd=2, padx=6, pady=4)
+        self.compare_mode = False
+        self.target_count = 0
+        self.axle_count = 0
+
+        tk.Label(self.frame, text=name, font=('Arial', 11, 'bold'), bg='#16213e', fg='#ffffff').pack(anchor=tk.W)
+        self.count_label = tk.Label(self.frame, text="00", font=('Courier', 28, 'bold'), bg='#16213e', fg='#00ff00')
+        self.count_label.pack()
+        self.mode_label = tk.Label(self.frame, text="COUNT", font=('Arial', 9), bg='#16213e', fg='#aaaaaa')
+        self.mode_label.pack()
+        self.temp_label = tk.Label(self.frame, text="--°C", font=('Arial', 10, 'bold'), bg='#16213e', fg='#00aaff')
+        self.temp_label.pack()
+        self.led_label = tk.Label(self.frame, text="LED OFF", font=('Arial', 9), bg='#16213e', fg='#888888')
+        self.led_label.pack()
+
+        dots = tk.Frame(self.frame, bg='#16213e')
+        dots.pack()
+        self.device_dots = {}
+        for role in ROLES:
+            dot = tk.Label(dots, text="●", font=('Arial', 10), bg='#16213e', fg='#444444')
+            dot.pack(side=tk.LEFT)
+            self.device_dots[role] = dot
+
+        self.status_label = tk.Label(self.frame, text="", font=('Arial', 7), bg='#16213e', fg='#aaaaaa',
+                                     width=22, anchor=tk.W)
+        self.status_label.pack()
+
+    def apply(self, changes):
+        widgets = self.widgets
+        if "axle_count" in changes:
+            self.axle_count = changes["axle_count"]
+        if "compare_mode" in changes:
+            self.compare_mode = changes["compare_mode"]
+        if "target_count" in changes:
+            self.target_count = changes["target_count"]
+
+        if {"axle_count", "compare_mode", "target_count"} & changes.keys():
+            widgets.config(self.count_label, text=f"{self.axle_count:02d}")
+            if self.compare_mode and self.target_count > 0:
+                widgets.config(self.mode_label, text=f"target {self.target_count}")
+                if self.axle_count == self.target_count:
+                    widgets.config(self.count_label, fg='#00ff00')
+                elif self.axle_count > self.target_count:
+                    widgets.config(self.count_label, fg='#ff0000')
+                else:
+                    widgets.config(self.count_label, fg='#ffaa00')
+            else:
+                widgets.config(self.mode_label, text="COUNT")
+                widgets.config(self.count_label, fg='#00ff00')
+        if "match_status" in changes:
+            widgets.config(self.frame, bg='#1f4d2b' if changes["match_status"] else '#16213e')
+        if "temperature" in changes or "rising_alarm" in changes or "hot_axle" in changes:
+            temperature = changes.get("temperature")
+            if temperature is not None:
+                if temperature > -50:
+                    color = '#ff0000' if temperature > 80 else '#ffaa00' if temperature > 60 else '#00aaff'
+                    widgets.config(self.temp_label, text=f"{temperature:.1f}°C", fg=color)
+                else:
+                    widgets.config(self.temp_label, text="--°C", fg='#888888')
+            if changes.get("rising_alarm"):
+                widgets.config(self.temp_label, fg='#ff6600')
+        if "led_state" in changes:
+            state = changes["led_state"]
+            widgets.config(self.led_label, text=f"LED {state}", fg='#ff0000' if state == "ON" else '#888888')
+        if "device_states" in changes:
+            for role, state in changes["device_states"].items():
+                widgets.config(self.device_dots[role], fg=STATE_COLORS.get(state, '#888888'))
+        if "status" in changes:
+            widgets.config(self.status_label, text=changes["status"][:40])
+
+
+class SectionOverview:
+    def __init__(self, root, manager):
+        self.root = root
+        self.manager = manager
+        self.root.title("Railway Axle Counter - Sections")
+        self.root.configure(bg='#1a1a2e')
+
+        self.state = StateStore()
+        self.widgets = WidgetCache()
+        grid = tk.Frame(root, bg='#1a1a2e')
+        grid.pack(fill=tk.BOTH, expand=True, padx=6, pady=6)
+        columns = min(TILE_COLUMNS, max(1, math.ceil(math.sqrt(len(manager.engines)))))
+        self.tiles = {}
+        for i, name in enumerate(manager.engines):
+            tile = SectionTile(grid, name, self.widgets)
+            tile.frame.grid(row=i // columns, column=i % columns, padx=4, pady=4, sticky="nsew")
+            self.tiles[name] = tile
+
+        self.gui_pump = GuiPump(self.root, self.state, self.apply_state_changes)
+        self.gui_pump.start()
+
+        self._subscriptions = []
+        for name, engine in manager.engines.items():
+            callback = self._forwarder(name)
+            self._subscriptions.append((engine, callback))
+            engine.subscribe(callback)
+        manager.apply_targets()
+        manager.start()
+
+    def _forwarder(self, name):
+        def on_engine_changes(changes):
+            self.state.set(**{f"{name}/{field}": value for field, value in changes.items()})
+        return on_engine_changes
+
+    def apply_state_changes(self, changes):
+        by_section = {}
+        for key, value in changes.items():
+            name, _, field = key.partition("/")
+            by_section.setdefault(name, {})[field] = value
+        for name, section_changes in by_section.items():
+            self.tiles[name].apply(section_changes)
+
+    def on_closing(self):
+        self.gui_pump.stop()
+        for engine, callback in self._subscriptions:
+            engine.unsubscribe(callback)
+        self.manager.stop()
+        self.root.destroy()
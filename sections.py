@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""Several track sections supervised by one process.
+
+Each section is a full AxleCounterEngine (its own count, target,
+temperature history and LED alert logic), but all of them share a single
+AsyncSerialMultiplexer, so every port on the host is serviced by one
+event loop thread. Steady-state cost per device is one
+wakeup per read whatever the number of ports.
+
+Sections are declared in a JSON file:
+
+    {
+      "sections": [
+        {"name": "North", "target": 24,
+         "ports": {"UNO": "/dev/serial/by-id/usb-Arduino_Uno_8573...",
+                   "NANO_TEMP": "/dev/serial/by-id/usb-1a86_USB2.0-Ser_-if00-port0",
+                   "NANO_LED": "/dev/serial/by-id/usb-1a86_USB2.0-Ser_-if00-port1"}},
+        {"name": "South", "ports": {"UNO": "/dev/ttyACM1"}}
+      ]
+    }
+
+Every board prints the same banner, so ports are never auto-discovered
+here; roles left out of a section are simply absent.
+
+Usage:
+    python3 sections.py sections.json [--metrics-port N] [--events DB] [--dashboard-port N]
+                                      [--shared-state NAME] [--record LOG]
+
+Each section's state is published to shared memory as NAME_<section>.
+"""
+import argparse
+import json
+import signal
+import threading
+
+import log
+from dashboard import DEFAULT_PORT as DASHBOARD_PORT, DashboardServer
+from engine import ROLES, UNO, AxleCounterEngine
+from event_store import DB_PATH as EVENTS_PATH, EventStore
+from metrics import DEFAULT_PORT as METRICS_PORT, Metrics, MetricsServer, render_prometheus
+from shared_state import DEFAULT_NAME as SHARED_STATE_NAME
+from aio_serial import AsyncSerialMultiplexer
+
+
+class SectionConfig:
+    def __init__(self, name, ports, target=None):
+        self.name = name
+        self.ports = ports
+        self.target = target
+
+
+def load_sections(path):
+    with open(path) as f:
+        data = json.load(f)
+
+    configs = []
+    for entry in data.get("sections", []):
+        name = entry.get("name")
+        if not name or "/" in name:
+            raise ValueError(f"{path}: every section needs a name without '/'")
+        if any(c.name == name for c in configs):
+            raise ValueError(f"{path}: duplicate section {name!r}")
+        ports = entry.get("ports", {})
+        unknown = set(ports) - set(ROLES)
+        if unknown:
+            raise ValueError(f"{path}: section {name!r} has unknown roles {sorted(unknown)}")
+        configs.append(SectionConfig(name, ports, entry.get("target")))
+    if not configs:
+        raise ValueError(f"{path}: no sections defined")
+    return configs
+
+
+class SectionManager:
+    def __init__(self, configs):
+        self.configs = configs
+        self.serial_mux = AsyncSerialMultiplexer()
+        self.metrics = Metrics()
+        self.serial_mux.metrics = self.metrics
+        self.engines = {}
+        for config in configs:
+            self.engines[config.name] = AxleCounterEngine(
+                config.ports,
+                section=config.name,
+                serial_mux=self.serial_mux,
+                metrics=self.metrics,
+                discover_missing=False,
+            )
+        self.recorder = None
+        self.event_store = None
+        self.metrics_server = None
+        self.dashboard = None
+
+    def record_to(self, path):
+        """Capture every section's serial traffic into one traffic log"""
+        from traffic_log import TrafficRecorder
+
+        self.recorder = TrafficRecorder(path)
+        self.serial_mux.tap = self.recorder.inbound
+        for engine in self.engines.values():
+            engine.recorder = self.recorder
+
+    def store_events(self, path):
+        self.event_store = EventStore(path)
+        for name, engine in self.engines.items():
+            engine.subscribe(self.event_store.subscriber(name))
+
+    def serve_metrics(self, port):
+        engines = list(self.engines.values())
+        try:
+            self.metrics_server = MetricsServer(lambda: render_prometheus(engines, self.event_store), port)
+        except OSError as e:
+            log.warning("metrics", "endpoint unavailable on port %d: %s", port, e)
+            return
+        self.metrics_server.start()
+        log.info("metrics", "serving http://127.0.0.1:%d/metrics", port)
+
+    def share_state(self, name):
+        for section, engine in self.engines.items():
+            engine.share_state(f"{name}_{section}")
+
+    def serve_dashboard(self, port, host="0.0.0.0"):
+        try:
+            self.dashboard = DashboardServer(port, host)
+        except OSError as e:
+            log.warning("dashboard", "unavailable on port %d: %s", port, e)
+            return
+        self.dashboard.start()
+        for name, engine in self.engines.items():
+            engine.subscribe(self.dashboard.subscriber(name))
+        log.info("dashboard", "serving http://%s:%d/", host, port)
+
+    def apply_targets(self):
+        """Put each section with a configured target into COMPARE mode once its UNO is ready"""
+        for config in self.configs:
+            if config.target:
+                engine = self.engines[config.name]
+                engine.subscribe(self._target_on_ready(engine, config.target))
+
+    @staticmethod
+    def _target_on_ready(engine, target):
+        def on_ready(changes):
+            states = changes.get("device_states")
+            if states and states.get(UNO) == "ready":
+                engine.unsubscribe(on_ready)
+                engine.set_compare_mode(target)
+        return on_ready
+
+    def start(self):
+        self.serial_mux.start()
+        for engine in self.engines.values():
+            engine.start()
+
+    def stop(self):
+        for engine in self.engines.values():
+            engine.stop()
+        self.serial_mux.close()
+        if self.recorder:
+            self.recorder.close()
+        if self.event_store:
+            self.event_store.close()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        if self.dashboard:
+            self.dashboard.stop()
+
+
+def run_headless(configs, metrics_port=None, events=None, dashboard_port=None, shared_state=None, record=None):
+    """Run every section without Tk until SIGINT/SIGTERM"""
+    manager = SectionManager(configs)
+    if record:
+        manager.record_to(record)
+    if shared_state:
+        manager.share_state(shared_state)
+    if events:
+        manager.store_events(events)
+    if metrics_port:
+        manager.serve_metrics(metrics_port)
+    if dashboard_port:
+        manager.serve_dashboard(dashboard_port)
+    stop = threading.Event()
+
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    log.install_dump_signal()
+
+    def status_printer(name):
+        def on_change(changes):
+            if "status" in changes:
+                log.info("status", "%s", changes["status"], section=name)
+        return on_change
+
+    for name, engine in manager.engines.items():
+        engine.subscribe(status_printer(name))
+    manager.apply_targets()
+    manager.start()
+    try:
+        stop.wait()
+    finally:
+        manager.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several track sections headless")
+    parser.add_argument("config", help="sections JSON file")
+    parser.add_argument("--events", metavar="DB", default=EVENTS_PATH, help=f"event store (default {EVENTS_PATH})")
+    parser.add_argument("--no-events", action="store_true", help="don't persist events")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT, help="0 to disable")
+    parser.add_argument("--dashboard-port", type=int, default=0, help=f"serve the browser dashboard, e.g. {DASHBOARD_PORT}")
+    parser.add_argument("--shared-state", metavar="NAME", default=SHARED_STATE_NAME,
+                        help=f"shared memory name prefix (default {SHARED_STATE_NAME})")
+    parser.add_argument("--no-shared-state", action="store_true", help="don't publish state to shared memory")
+    parser.add_argument("--record", metavar="LOG", help="capture all serial traffic to LOG for traffic_log.py replay")
+    log.add_arguments(parser)
+    args = parser.parse_args()
+    log.configure(level=args.log_level, fmt=args.log_format)
+    run_headless(load_sections(args.config), args.metrics_port, None if args.no_events else args.events,
+                 args.dashboard_port, None if args.no_shared_state else args.shared_state, args.record)
+
+
+if __name__ == "__main__":
+    main()
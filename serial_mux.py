@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Single-threaded serial I/O reactor.
+
+All Arduino ports are registered with one selector, so the reader thread
+sleeps in the kernel until bytes arrive on any of them, drains everything
+waiting in one read and hands complete frames (bytes, no newline) to the
+registered handler.
+
+The framing, upgrade and delivery code is shared with
+aio_serial.AsyncSerialMultiplexer, which drives it from an asyncio loop
+instead of a selector thread.
+"""
+import os
+import selectors
+import threading
+from time import perf_counter_ns
+
+import serial
+
+import log
+from protocol import LineFramer
+
+
+class _Channel:
+    def __init__(self, name, port, handler, on_lost=None):
+        self.name = name
+        self.port = port
+        self.handler = handler
+        self.on_lost = on_lost
+        self.framer = LineFramer()
+        self.upgrade = None
+        self.bytes_in = 0
+        self.frames_in = 0
+
+
+class SerialMultiplexer:
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.channels = {}
+        self.running = False
+        self._thread = None
+        # Optional tap(name, data) called with every raw read, e.g. a recorder
+        self.tap = None
+        # Optional metrics.Metrics; arrival_ns is when the bytes being
+        # handled right now were read, for handlers timing their own work
+        self.metrics = None
+        self.arrival_ns = 0
+
+        # Self-pipe so stop()/add() can wake a blocked select()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def add(self, name, port, handler, on_lost=None):
+        """Register an open serial port; handler(frame) gets each raw frame.
+
+        If reading fails (cable pulled, board reset) the channel is removed
+        and on_lost(error) is called on the reactor thread.
+        """
+        channel = _Channel(name, port, handler, on_lost)
+        self.channels[name] = channel
+        self.selector.register(port.fileno(), selectors.EVENT_READ, channel)
+        self._wake()
+
+    def add_virtual(self, name, handler):
+        """Register a channel with no port; bytes arrive through inject()"""
+        self.channels[name] = _Channel(name, None, handler)
+
+    def inject(self, name, data):
+        """Run data through a channel's framing exactly as if it had been read"""
+        self.arrival_ns = perf_counter_ns()
+        self._feed(self.channels[name], data)
+
+    def request_upgrade(self, name, ack, framer, handler):
+        """Switch a channel to a new framer right after the line starting with ack.
+
+        The split happens at the byte level, so nothing sent after the
+        acknowledgement is ever run through the text framer.
+        """
+        channel = self.channels.get(name)
+        if channel:
+            channel.upgrade = (ack, framer, handler)
+
+    def cancel_upgrade(self, name):
+        channel = self.channels.get(name)
+        if channel:
+            channel.upgrade = None
+
+    def remove(self, name):
+        channel = self.channels.pop(name, None)
+        if channel is None or channel.port is None:
+            return
+        try:
+            self.selector.unregister(channel.port.fileno())
+        except (KeyError, ValueError, OSError):
+            pass
+
+    def start(self):
+        self.running = True
+        self._thread = threading.Thread(target=self._run, name="serial-mux", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self.running = False
+        self._wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def close(self):
+        self.stop()
+        for name in list(self.channels):
+            self.remove(name)
+        self.selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run(self):
+        while self.running:
+            for key, _ in self.selector.select():
+                if key.data is None:
+                    self._drain_wake()
+                else:
+                    self._service(key.data)
+
+    def _service(self, channel):
+        self.arrival_ns = perf_counter_ns()
+        try:
+            # in_waiting is never 0 here unless the device went away,
+            # in which case pyserial raises instead of blocking
+            data = channel.port.read(channel.port.in_waiting or 1)
+        except (OSError, serial.SerialException) as e:
+            log.error("serial", "%s read error: %s", channel.name, e)
+            self.remove(channel.name)
+            if channel.on_lost:
+                channel.on_lost(e)
+            return
+
+        if self.tap:
+            self.tap(channel.name, data)
+        self._feed(channel, data)
+
+    def _feed(self, channel, data):
+        channel.bytes_in += len(data)
+        if channel.upgrade:
+            data = self._check_upgrade(channel, data)
+
+        frames = channel.framer.feed(data)
+        metrics = self.metrics
+        if metrics and frames:
+            metrics.framed.observe_ns(perf_counter_ns() - self.arrival_ns)
+        self._deliver(channel, frames)
+        if metrics and frames:
+            metrics.handled.observe_ns(perf_counter_ns() - self.arrival_ns)
+
+    def _check_upgrade(self, channel, data):
+        ack, framer, handler = channel.upgrade
+        # The text framer's buffer never holds a newline, so the end of
+        # the ack line is always inside data
+        pending = len(channel.framer.buffer)
+        joined = bytes(channel.framer.buffer) + data
+        start = joined.find(ack)
+        if start < 0:
+            return data
+        end = joined.find(b"\n", start)
+        if end < 0:
+            return data
+
+        cut = end + 1 - pending
+        self._deliver(channel, channel.framer.feed(data[:cut]))
+        channel.framer = framer
+        channel.handler = handler
+        channel.upgrade = None
+        return data[cut:]
+
+    def _deliver(self, channel, frames):
+        channel.frames_in += len(frames)
+        for frame in frames:
+            log.frame(channel.name, "<", frame)
+            try:
+                channel.handler(frame)
+            except Exception as e:
+                log.error("serial", "%s handler error: %r", channel.name, e)
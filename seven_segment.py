@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Retained-mode 7-segment renderer for Tk canvases.
+
+Segment items are created once per canvas and only the segments whose
+on/off state changes between digits are reconfigured.
+
+Numbers of any width are encoded from two tables covering every
+LUT_DIGITS-digit value: BCD_TABLE packs 4 bits per digit, SEGMENT_TABLE 7
+segment bits per digit, ones digit in the low bits. encode() does one
+lookup per LUT_DIGITS digits, and DigitRow only touches the digits whose
+bits changed.
+"""
+
+# Segment polygons in bit order: bit 0 = a ... bit 6 = g
+SEGMENT_COORDS = (
+    (25, 5, 75, 15),     # a
+    (75, 15, 85, 55),    # b
+    (75, 75, 85, 115),   # c
+    (25, 115, 75, 125),  # d
+    (15, 75, 25, 115),   # e
+    (15, 15, 25, 55),    # f
+    (25, 60, 75, 70),    # g
+)
+
+#                gfedcba
+DIGIT_MASKS = (
+    0b0111111,  # 0
+    0b0000110,  # 1
+    0b1011011,  # 2
+    0b1001111,  # 3
+    0b1100110,  # 4
+    0b1101101,  # 5
+    0b1111101,  # 6
+    0b0000111,  # 7
+    0b1111111,  # 8
+    0b1101111,  # 9
+)
+
+LUT_DIGITS = 4
+LUT_SIZE = 10 ** LUT_DIGITS
+
+# BCD of n reads as n in hex
+BCD_TABLE = [int(str(n), 16) for n in range(LUT_SIZE)]
+SEGMENT_TABLE = [
+    DIGIT_MASKS[n // 1000] << 21 | DIGIT_MASKS[n // 100 % 10] << 14
+    | DIGIT_MASKS[n // 10 % 10] << 7 | DIGIT_MASKS[n % 10]
+    for n in range(LUT_SIZE)
+]
+
+OFF_FILL = '#1a1a1a'
+OFF_OUTLINE = '#333333'
+
+
+def encode(value, digits):
+    """(BCD word, segment word) for value zero-padded to digits, which wraps
+    like the hardware past 10**digits - 1"""
+    value %= 10 ** digits
+    chunk = value % LUT_SIZE
+    bcd = BCD_TABLE[chunk]
+    segments = SEGMENT_TABLE[chunk]
+    shift = LUT_DIGITS
+    while shift < digits:
+        value //= LUT_SIZE
+        chunk = value % LUT_SIZE
+        bcd |= BCD_TABLE[chunk] << 4 * shift
+        segments |= SEGMENT_TABLE[chunk] << 7 * shift
+        shift += LUT_DIGITS
+    return bcd, segments & ((1 << 7 * digits) - 1)
+
+
+class SevenSegmentDisplay:
+    def __init__(self, canvas, color='#ff0000'):
+        self.canvas = canvas
+        self.on_style = {'fill': color, 'outline': color, 'width': 2}
+        self.off_style = {'fill': OFF_FILL, 'outline': OFF_OUTLINE, 'width': 1}
+        self.mask = 0
+        self.items = [
+            canvas.create_polygon(coords, **self.off_style)
+            for coords in SEGMENT_COORDS
+        ]
+
+    def set_mask(self, mask):
+        changed = mask ^ self.mask
+        if not changed:
+            return
+        self.mask = mask
+        while changed:
+            bit = changed & -changed
+            index = bit.bit_length() - 1
+            style = self.on_style if mask & bit else self.off_style
+            self.canvas.itemconfigure(self.items[index], **style)
+            changed ^= bit
+
+
+class DigitRow:
+    """Several SevenSegmentDisplays showing one number, ones digit first"""
+
+    def __init__(self, displays):
+        self.displays = displays
+        self.digits = len(displays)
+        self.segments = 0
+        self.bcd = 0
+
+    def set_value(self, value):
+        """Show value; returns its BCD word"""
+        self.bcd, segments = encode(value, self.digits)
+        changed = segments ^ self.segments
+        self.segments = segments
+        while changed:
+            index = ((changed & -changed).bit_length() - 1) // 7
+            self.displays[index].set_mask(segments >> 7 * index & 0x7F)
+            changed &= ~(0x7F << 7 * index)
+        return self.bcd
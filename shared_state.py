@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""Engine state in a fixed-layout shared memory segment.
+
+Co-located processes (the interlock bridge, a data logger) read the live
+count, target, match flag and temperature straight out of
+/dev/shm/<name> instead of scraping the window or opening the ports:
+
+    from shared_state import SharedStateReader
+
+    reader = SharedStateReader()          # "adld_state" by default
+    state = reader.read()                 # plain memory reads, no syscalls
+    while True:
+        state = reader.wait()             # sleeps until the engine publishes
+        print(state.axle_count, state.match_status)
+
+Layout (little endian, LAYOUT_VERSION 1):
+
+    0   4s  magic b"ADLD"
+    4   H   layout version
+    6   H   segment size
+    8   I   writer pid
+    12  I   reserved
+    16  Q   sequence number, odd while an update is being written
+    24  d   temperature (°C)
+    32  d   temperature rate (°C/min)
+    40  d   time of the last update (UNIX seconds)
+    48  i   axle count
+    52  i   target (0 in COUNT mode)
+    56  B   compare mode, match, hot axle, rising alarm (one byte each)
+    60  B   LED state, then UNO, NANO_TEMP, NANO_LED device state (codes)
+
+Reads follow the seqlock protocol: read the sequence number, the fields,
+then the sequence number again, and retry if it was odd or moved.
+
+Change notification uses an abstract unix socket named after the segment.
+A reader that calls wait() connects to it, and the engine sends each
+connected reader one byte per update. Readers drain whatever piled up,
+so a slow reader just sees fewer, newer states.
+
+    python3 shared_state.py [--name NAME] [--watch]
+"""
+import argparse
+import os
+import select
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+from defaults import SHARED_STATE_NAME as DEFAULT_NAME
+
+LAYOUT_VERSION = 1
+MAGIC = b"ADLD"
+
+HEADER = struct.Struct("<4sHHII")
+SEQ = struct.Struct("<Q")
+STATE = struct.Struct("<dddiiBBBBBBBB")
+SEQ_OFFSET = HEADER.size
+STATE_OFFSET = SEQ_OFFSET + SEQ.size
+SIZE = STATE_OFFSET + STATE.size
+
+LED_STATES = ("OFF", "ON", "CONNECTED")
+DEVICE_STATES = ("discovering", "connecting", "waiting", "ready", "failed", "lost", "absent")
+# Order of the device state bytes, fixed by the layout
+ROLES = ("UNO", "NANO_TEMP", "NANO_LED")
+
+SharedState = namedtuple("SharedState", (
+    "seq", "axle_count", "target_count", "compare_mode", "match_status", "hot_axle",
+    "rising_alarm", "temperature", "temperature_rate", "led_state", "device_states", "updated",
+))
+
+
+def _address(name):
+    # Abstract namespace: nothing to clean up if the engine dies
+    return f"\0{name}.notify"
+
+
+def _code(values, value):
+    try:
+        return values.index(value) + 1
+    except ValueError:
+        return 0
+
+
+def _attach(name, **kwargs):
+    """Open (or create) a segment without letting the resource tracker unlink
+    it when this process exits or dies"""
+    try:
+        return shared_memory.SharedMemory(name, track=False, **kwargs)
+    except TypeError:
+        # Before 3.13 every open registers with the resource tracker
+        shm = shared_memory.SharedMemory(name, **kwargs)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class SharedStateWriter:
+    """Engine subscriber that mirrors state into the segment"""
+
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        # The socket doubles as the lock: the kernel frees it when its owner dies
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.listener.bind(_address(name))
+        except OSError:
+            self.listener.close()
+            raise FileExistsError(f"{name} is already published by another engine") from None
+        self.listener.listen(16)
+        self.listener.setblocking(False)
+        self.readers = []
+
+        self.shm = self._create(name)
+        self.buf = self.shm.buf
+        HEADER.pack_into(self.buf, 0, MAGIC, LAYOUT_VERSION, SIZE, os.getpid(), 0)
+        self.seq = SEQ.unpack_from(self.buf, SEQ_OFFSET)[0] & ~1
+        self.values = {
+            "axle_count": 0, "target_count": 0, "compare_mode": False, "match_status": False,
+            "hot_axle": False, "rising_alarm": False, "temperature": 0.0, "temperature_rate": 0.0,
+            "led_state": "OFF", "device_states": {},
+        }
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def _create(self, name):
+        # Untracked: if this engine is killed, a restarted one takes the
+        # segment over instead of the tracker unlinking it from under it
+        try:
+            return _attach(name, create=True, size=SIZE)
+        except FileExistsError:
+            pass
+        # Left behind by an engine that died; take it over
+        shm = _attach(name)
+        if shm.size < SIZE:
+            shm.close()
+            self.listener.close()
+            raise FileExistsError(f"{name} exists with an incompatible size")
+        return shm
+
+    def accept(self):
+        """Readable callback for the listener (event loop thread)"""
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except (BlockingIOError, OSError):
+                return
+            conn.setblocking(False)
+            with self._lock:
+                self.readers.append(conn)
+
+    def on_changes(self, changes):
+        """Engine subscriber: one seqlock write plus a byte per waiting reader"""
+        values = self.values
+        if not any(field in changes for field in values):
+            return
+        with self._lock:
+            for field in values:
+                if field in changes:
+                    values[field] = changes[field]
+            states = values["device_states"]
+            buf = self.buf
+            SEQ.pack_into(buf, SEQ_OFFSET, self.seq + 1)
+            STATE.pack_into(
+                buf, STATE_OFFSET,
+                values["temperature"], values["temperature_rate"], time.time(),
+                values["axle_count"], values["target_count"],
+                values["compare_mode"], values["match_status"], values["hot_axle"], values["rising_alarm"],
+                _code(LED_STATES, values["led_state"]),
+                *(_code(DEVICE_STATES, states.get(role)) for role in ROLES),
+            )
+            self.seq += 2
+            SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+            self.updates += 1
+            if self.readers:
+                self._notify()
+
+    def _notify(self):
+        gone = []
+        for conn in self.readers:
+            try:
+                conn.send(b"\1")
+            except BlockingIOError:
+                # Reader hasn't drained the last ones; it will see this state anyway
+                pass
+            except OSError:
+                gone.append(conn)
+        for conn in gone:
+            self.readers.remove(conn)
+            conn.close()
+
+    def close(self):
+        with self._lock:
+            for conn in self.readers:
+                conn.close()
+            self.readers.clear()
+        self.listener.close()
+        self.buf = None
+        self.shm.close()
+        if not hasattr(self.shm, "_track"):
+            # Before 3.13 unlink() also unregisters; keep the tracker balanced
+            resource_tracker.register(self.shm._name, "shared_memory")
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedStateReader:
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        self.shm = None
+        self.buf = None
+        self.sock = None
+        self.seq = 0
+        self._attach()
+
+    def _attach(self):
+        shm = _attach(self.name)
+        magic, version, size, _, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION or size > shm.size:
+            shm.close()
+            raise ValueError(f"{self.name} is not a layout {LAYOUT_VERSION} ADLD state segment")
+        self.shm = shm
+        self.buf = shm.buf
+
+    @property
+    def writer_pid(self):
+        return HEADER.unpack_from(self.buf, 0)[3]
+
+    def read(self):
+        """Consistent snapshot of the segment"""
+        buf = self.buf
+        spins = 0
+        while True:
+            seq = SEQ.unpack_from(buf, SEQ_OFFSET)[0]
+            if not seq & 1:
+                fields = STATE.unpack_from(buf, STATE_OFFSET)
+                if SEQ.unpack_from(buf, SEQ_OFFSET)[0] == seq:
+                    break
+            spins += 1
+            if spins % 100 == 0:
+                # The writer was preempted mid-update; let it finish
+                time.sleep(0)
+
+        temperature, rate, updated, count, target, compare, match, hot, rising, led, *devices = fields
+        self.seq = seq
+        return SharedState(
+            seq, count, target, bool(compare), bool(match), bool(hot), bool(rising),
+            temperature, rate,
+            LED_STATES[led - 1] if led else None,
+            {role: DEVICE_STATES[code - 1] for role, code in zip(ROLES, devices) if code},
+            updated,
+        )
+
+    def changed(self):
+        return SEQ.unpack_from(self.buf, SEQ_OFFSET)[0] != self.seq
+
+    def wait(self, timeout=None):
+        """Block until the state moves past the last one read; None on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.changed():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            if self.sock is None and not self._connect():
+                # Engine not running: check back now and then
+                time.sleep(0.5 if remaining is None else min(0.5, remaining))
+                continue
+            ready, _, _ = select.select([self.sock], [], [], remaining)
+            if ready and not self._drain():
+                # The engine went away; its successor will publish a new segment
+                self._reattach()
+        return self.read()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(_address(self.name))
+        except OSError:
+            sock.close()
+            self._reattach()
+            return False
+        sock.setblocking(False)
+        self.sock = sock
+        return True
+
+    def _drain(self):
+        try:
+            while True:
+                if not self.sock.recv(4096):
+                    return False
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+
+    def _reattach(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        try:
+            shm = _attach(self.name)
+        except FileNotFoundError:
+            return
+        if self.shm:
+            self.buf = None
+            self.shm.close()
+        self.shm = shm
+        self.buf = shm.buf
+
+    def close(self):
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+        self.buf = None
+        if self.shm:
+            self.shm.close()
+            self.shm = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the engine's shared memory state")
+    parser.add_argument("--name", default=DEFAULT_NAME, help=f"segment name (default {DEFAULT_NAME})")
+    parser.add_argument("--watch", action="store_true", help="print every change until Ctrl-C")
+    args = parser.parse_args()
+
+    reader = SharedStateReader(args.name)
+    state = reader.read()
+    try:
+        while True:
+            print(f"seq {state.seq:<8} count {state.axle_count:<6} target {state.target_count:<4} "
+                  f"match {int(state.match_status)}  {state.temperature:6.2f}°C  LED {state.led_state}  "
+                  f"{' '.join(f'{role}={s}' for role, s in state.device_states.items())}")
+            if not args.watch:
+                break
+            state = reader.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == "__main__":
+    main()
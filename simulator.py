@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""Virtual Arduino fleet on pseudo-terminals.
+
+Emulates the UNO axle counter, the temperature Nano and the LED Nano well
+enough to drive railway_display.py / the engine without hardware:
+
+    python3 simulator.py --rate 200 --burst 40 --gap 2 --noise 0.001
+    python3 railway_display.py --uno /tmp/adld-sim/UNO \\
+        --nano-temp /tmp/adld-sim/NANO_TEMP --nano-led /tmp/adld-sim/NANO_LED
+
+Event rate, train bursts, timing jitter and line noise are configurable;
+--binary makes the boards accept the PROTO:BIN1 upgrade. --sections N
+starts N fleets under LINK_DIR/S1..SN and writes LINK_DIR/sections.json
+for railway_display.py --sections. --flap N pulls every UNO's cable for
+a second every N seconds to exercise reconnects.
+"""
+import argparse
+import json
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+from binary_protocol import PROTO_ACK, encode_packet
+import protocol
+
+
+class VirtualDevice:
+    """One pty-backed board: a command reader thread plus an event emitter thread"""
+
+    name = "DEVICE"
+    banner = None
+
+    def __init__(self, link_dir=None, binary=False, noise=0.0, seed=None):
+        self.link = None
+        if link_dir:
+            os.makedirs(link_dir, exist_ok=True)
+            self.link = os.path.join(link_dir, self.name)
+        self._open_pty()
+
+        self.supports_binary = binary
+        self.binary = False
+        self.noise = noise
+        self.random = random.Random(seed)
+        self.seq = 0
+        self.sent = 0
+        self.connected = False
+        self.running = False
+        self._write_lock = threading.Lock()
+        self._threads = []
+
+    @property
+    def path(self):
+        return self.link or self.port
+
+    def start(self):
+        self.running = True
+        for target in (self._command_loop, self._emit_loop):
+            thread = threading.Thread(target=target, name=f"sim-{self.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self.running = False
+        for thread in self._threads:
+            thread.join(1.0)
+        if self.master is not None:
+            os.close(self.master)
+        if self.link and os.path.lexists(self.link):
+            os.remove(self.link)
+
+    def _open_pty(self):
+        self.master, slave = os.openpty()
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        # With no slave fd of our own, the master reports POLLHUP until the
+        # host opens the port, which is how a DTR reset on open is emulated
+        os.close(slave)
+        if self.link:
+            if os.path.lexists(self.link):
+                os.remove(self.link)
+            os.symlink(self.port, self.link)
+
+    def unplug(self):
+        """Pull the USB cable: the host's port fails and the link disappears"""
+        with self._write_lock:
+            self.connected = False
+            master, self.master = self.master, None
+            if self.link and os.path.lexists(self.link):
+                os.remove(self.link)
+            if master is not None:
+                os.close(master)
+
+    def plug(self):
+        """Plug the board back in; it enumerates as a new port behind the same link"""
+        with self._write_lock:
+            if self.master is None:
+                self._open_pty()
+
+    # ---- output -------------------------------------------------------
+
+    def render(self, tag, value):
+        if self.binary:
+            frame = encode_packet(tag, value, self.seq)
+            self.seq = (self.seq + 1) & 0xFF
+            return frame
+        if value is None:
+            line = tag
+        elif tag == protocol.TEMP:
+            line = f"{tag}:{value:.2f}"
+        elif tag == protocol.MATCH:
+            line = f"{tag}:{'TRUE' if value else 'FALSE'}"
+        else:
+            line = f"{tag}:{value}"
+        return line.encode() + b"\r\n"
+
+    def emit(self, tag, value=None):
+        self.write(self.render(tag, value))
+
+    def emit_many(self, messages):
+        self.write(b"".join(self.render(tag, value) for tag, value in messages))
+
+    def say(self, line):
+        """Free-form text reply; binary firmware doesn't send these"""
+        if not self.binary:
+            self.write(line.encode() + b"\r\n")
+
+    def write(self, data):
+        if self.noise and data:
+            data = bytearray(data)
+            for i in range(len(data)):
+                if self.random.random() < self.noise:
+                    data[i] ^= 1 << self.random.randrange(8)
+            data = bytes(data)
+        with self._write_lock:
+            if not (self.running and self.connected) or self.master is None:
+                return
+            view = memoryview(data)
+            while view:
+                try:
+                    written = os.write(self.master, view)
+                except OSError:
+                    return
+                view = view[written:]
+            self.sent += 1
+
+    # ---- input --------------------------------------------------------
+
+    def on_host_open(self):
+        """The host opened the port: behave like a freshly reset board"""
+        self.binary = False
+        self.seq = 0
+        if self.banner:
+            self.emit(self.banner)
+
+    def _command_loop(self):
+        poller = None
+        registered = None
+        buffer = b""
+        while self.running:
+            master = self.master
+            if master is None:
+                time.sleep(0.02)
+                continue
+            if master != registered:
+                poller = select.poll()
+                poller.register(master, select.POLLIN)
+                registered = master
+                buffer = b""
+            events = poller.poll(200 if self.connected else 50)
+            hangup = any(event & (select.POLLHUP | select.POLLNVAL) for _, event in events)
+            if hangup:
+                self.connected = False
+                buffer = b""
+                time.sleep(0.05)
+                continue
+            if not self.connected:
+                self.connected = True
+                self.on_host_open()
+            if not events:
+                continue
+            try:
+                data = os.read(master, 1024)
+            except OSError:
+                self.connected = False
+                continue
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for raw in lines:
+                command = raw.decode("ascii", errors="ignore").strip()
+                if command:
+                    self.handle_command(command)
+
+    def handle_command(self, command):
+        if command == PROTO_ACK.decode() and self.supports_binary and not self.binary:
+            with self._write_lock:
+                if self.master is None:
+                    return
+                os.write(self.master, PROTO_ACK + b"\r\n\x00")
+            self.binary = True
+            return
+        self.on_command(command)
+
+    def on_command(self, command):
+        pass
+
+    def _emit_loop(self):
+        pass
+
+
+class VirtualUno(VirtualDevice):
+    name = "UNO"
+    banner = protocol.UNO_READY
+
+    def __init__(self, rate=2.0, burst=0, gap=0.0, jitter=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.rate = rate
+        self.burst = burst
+        self.gap = gap
+        self.jitter = jitter
+        self.count = 0
+        self.target = 0
+        self.compare_mode = False
+        self.matched = False
+        self._state_lock = threading.Lock()
+
+    def on_host_open(self):
+        with self._state_lock:
+            self.count = 0
+            self.target = 0
+            self.compare_mode = False
+            self.matched = False
+        super().on_host_open()
+
+    def on_command(self, command):
+        with self._state_lock:
+            if command == "MODE:COMPARE":
+                self.compare_mode = True
+                self.say("MODE_SET:COMPARE")
+            elif command == "MODE:COUNT":
+                self.compare_mode = False
+                self.matched = False
+                self.say("MODE_SET:COUNT")
+            elif command.startswith("TARGET:"):
+                try:
+                    self.target = int(command.split(":")[1])
+                except ValueError:
+                    return
+                self.matched = False
+                self.say(f"TARGET_SET:{self.target}")
+            elif command == "RESET":
+                self.count = 0
+                self.matched = False
+                self.say("COUNT_RESET")
+                self.emit(protocol.COUNT, 0)
+            elif command == "STATUS":
+                self.emit(protocol.COUNT, self.count)
+                self.say(f"TARGET:{self.target}")
+                self.say(f"MODE:{'COMPARE' if self.compare_mode else 'COUNT'}")
+
+    def _axle_messages(self, n):
+        messages = []
+        with self._state_lock:
+            for _ in range(n):
+                self.count += 1
+                messages.append((protocol.COUNT, self.count))
+                if self.compare_mode and self.target > 0:
+                    match = self.count == self.target
+                    if match != self.matched:
+                        self.matched = match
+                        messages.append((protocol.MATCH, match))
+        return messages
+
+    def _emit_loop(self):
+        if self.rate <= 0:
+            return
+        interval = 1.0 / self.rate
+        next_t = time.monotonic()
+        in_burst = 0
+        while self.running:
+            now = time.monotonic()
+            if now < next_t:
+                time.sleep(min(next_t - now, 0.2))
+                continue
+
+            # Catch up on everything that is due in a single write
+            due = int((now - next_t) / interval) + 1
+            if self.burst:
+                due = min(due, self.burst - in_burst)
+            self.emit_many(self._axle_messages(due))
+            next_t += due * interval
+            if self.jitter:
+                next_t += interval * self.jitter * self.random.uniform(-1, 1)
+
+            if self.burst:
+                in_burst += due
+                if in_burst >= self.burst:
+                    in_burst = 0
+                    next_t = time.monotonic() + self.gap
+
+
+class VirtualTempNano(VirtualDevice):
+    name = "NANO_TEMP"
+    banner = protocol.NANO_READY
+
+    def __init__(self, period=1.0, start_temp=25.0, drift=0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.period = period
+        self.temperature = start_temp
+        self.drift = drift
+
+    def on_command(self, command):
+        if command == "STATUS":
+            self.emit(protocol.TEMP, self.temperature)
+
+    def _emit_loop(self):
+        while self.running:
+            time.sleep(self.period)
+            self.temperature = min(125.0, max(-10.0, self.temperature + self.random.uniform(-self.drift, self.drift * 1.1)))
+            self.emit(protocol.TEMP, self.temperature)
+            if self.temperature > 80:
+                self.emit(protocol.HOT_AXLE_ALERT)
+
+
+class VirtualLedNano(VirtualDevice):
+    name = "NANO_LED"
+    banner = protocol.NANO_LED_READY
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.led_on = False
+
+    def on_command(self, command):
+        if command == "TARGET_REACHED":
+            self.led_on = True
+        elif command == "RESET":
+            self.led_on = False
+        elif command != "STATUS":
+            return
+        self.emit(protocol.LED, "ON" if self.led_on else "OFF")
+
+
+class Fleet:
+    def __init__(self, link_dir=None, rate=2.0, burst=0, gap=0.0, jitter=0.0,
+                 noise=0.0, temp_period=1.0, binary=False, seed=None):
+        common = {"link_dir": link_dir, "binary": binary, "noise": noise, "seed": seed}
+        self.uno = VirtualUno(rate=rate, burst=burst, gap=gap, jitter=jitter, **common)
+        self.nano_temp = VirtualTempNano(period=temp_period, **common)
+        self.nano_led = VirtualLedNano(**common)
+        self.devices = (self.uno, self.nano_temp, self.nano_led)
+
+    @property
+    def ports(self):
+        return {device.name: device.path for device in self.devices}
+
+    def start(self):
+        for device in self.devices:
+            device.start()
+
+    def stop(self):
+        for device in self.devices:
+            device.stop()
+
+
+def write_sections_config(fleets, path, target=None):
+    sections = []
+    for name, fleet in fleets.items():
+        entry = {"name": name, "ports": fleet.ports}
+        if target:
+            entry["target"] = target
+        sections.append(entry)
+    with open(path, "w") as f:
+        json.dump({"sections": sections}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual Arduino fleet on pseudo-terminals")
+    parser.add_argument("--link-dir", default="/tmp/adld-sim", help="directory for stable port symlinks")
+    parser.add_argument("--rate", type=float, default=2.0, help="axles per second while a train is passing")
+    parser.add_argument("--burst", type=int, default=0, help="axles per train (0 = continuous)")
+    parser.add_argument("--gap", type=float, default=5.0, help="seconds between trains")
+    parser.add_argument("--jitter", type=float, default=0.0, help="timing jitter as a fraction of the interval")
+    parser.add_argument("--noise", type=float, default=0.0, help="probability of a bit flip per byte")
+    parser.add_argument("--temp-period", type=float, default=1.0, help="seconds between TEMP readings")
+    parser.add_argument("--binary", action="store_true", help="accept the PROTO:BIN1 upgrade")
+    parser.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = until Ctrl-C)")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--sections", type=int, default=0, help="start N fleets and write LINK_DIR/sections.json")
+    parser.add_argument("--target", type=int, help="target written into sections.json")
+    parser.add_argument("--flap", type=float, default=0, help="unplug every UNO for 1 s every N seconds")
+    args = parser.parse_args()
+
+    if args.sections:
+        link_dirs = {f"S{i + 1}": os.path.join(args.link_dir, f"S{i + 1}") for i in range(args.sections)}
+    else:
+        link_dirs = {None: args.link_dir}
+    fleets = {}
+    for name, link_dir in link_dirs.items():
+        seed = None if args.seed is None else args.seed + len(fleets)
+        fleets[name] = Fleet(link_dir, args.rate, args.burst, args.gap, args.jitter,
+                             args.noise, args.temp_period, args.binary, seed)
+    for name, fleet in fleets.items():
+        fleet.start()
+        for device in fleet.devices:
+            print(f"{device.name:<10} {device.path} -> {device.port}")
+    if args.sections:
+        config = os.path.join(args.link_dir, "sections.json")
+        write_sections_config(fleets, config, args.target)
+        print(f"Sections config: {config}")
+    print("Ctrl-C to stop")
+
+    start = time.monotonic()
+    next_flap = start + args.flap
+    try:
+        while not args.duration or time.monotonic() - start < args.duration:
+            time.sleep(1.0)
+            if args.flap and time.monotonic() >= next_flap:
+                for fleet in fleets.values():
+                    fleet.uno.unplug()
+                time.sleep(1.0)
+                for fleet in fleets.values():
+                    fleet.uno.plug()
+                next_flap = time.monotonic() + args.flap
+            if len(fleets) == 1:
+                fleet = next(iter(fleets.values()))
+                print(f"\rUNO count {fleet.uno.count}  temp {fleet.nano_temp.temperature:.2f}  LED {'ON' if fleet.nano_led.led_on else 'OFF'}", end="", flush=True)
+            else:
+                counts = " ".join(str(fleet.uno.count) for fleet in fleets.values())
+                print(f"\rUNO count {counts}", end="", flush=True)
+    except KeyboardInterrupt:
+        pass
+    print()
+    for fleet in fleets.values():
+        fleet.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Fixed-size temperature history with rolling statistics.
+
+Readings go into preallocated array('d') rings, so append is O(1) and
+memory stays flat however long the system runs. Every statistic is kept
+up to date incrementally as samples enter and leave:
+
+    min / max   monotonic deques over the whole buffer
+    mean        running sum
+    ewma        exponentially weighted moving average
+    rate        least-squares slope (°C/min) over the last `window`
+                seconds, from running sums advanced by a trailing index
+
+Nothing rescans the history except downsample(), which builds the
+sparkline view and runs once per reading rather than per pixel.
+snapshot() packs the statistics and that view into an immutable
+TemperatureView for readers on other threads.
+"""
+from array import array
+from collections import deque, namedtuple
+
+DEFAULT_CAPACITY = 3600
+DEFAULT_WINDOW = 30.0
+DEFAULT_ALPHA = 0.2
+# Window times are kept relative to t0; moving t0 up this often keeps the
+# running sums small enough that float cancellation never matters
+REBASE_AFTER = 3600.0
+
+TemperatureView = namedtuple("TemperatureView", "latest min max mean points")
+
+
+class TemperatureHistory:
+    def __init__(self, capacity=DEFAULT_CAPACITY, window=DEFAULT_WINDOW, alpha=DEFAULT_ALPHA):
+        self.capacity = capacity
+        self.window = window
+        self.alpha = alpha
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        # Samples are numbered 0, 1, 2, ...; sample n lives at n % capacity
+        self.first = 0
+        self.next = 0
+
+        self.total = 0.0
+        self.ewma = None
+        self._min = deque()
+        self._max = deque()
+
+        # Rate-of-rise window [self.window_first, self.next), times relative to t0
+        self.t0 = None
+        self.window_first = 0
+        self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+
+    def __len__(self):
+        return self.next - self.first
+
+    def append(self, t, value):
+        if len(self) == self.capacity:
+            self._evict()
+        n = self.next
+        slot = n % self.capacity
+        self.times[slot] = t
+        self.values[slot] = value
+        self.next = n + 1
+
+        self.total += value
+        self.ewma = value if self.ewma is None else self.ewma + self.alpha * (value - self.ewma)
+        while self._min and self.values[self._min[-1] % self.capacity] >= value:
+            self._min.pop()
+        self._min.append(n)
+        while self._max and self.values[self._max[-1] % self.capacity] <= value:
+            self._max.pop()
+        self._max.append(n)
+
+        if self.t0 is None:
+            self.t0 = t
+        elif t - self.t0 > REBASE_AFTER:
+            self._rebase(t)
+        self._window_add(t - self.t0, value)
+        while self.window_first < n and t - self.times[self.window_first % self.capacity] > self.window:
+            self._window_drop(self.window_first)
+
+    def _evict(self):
+        n = self.first
+        self.total -= self.values[n % self.capacity]
+        if self._min[0] == n:
+            self._min.popleft()
+        if self._max[0] == n:
+            self._max.popleft()
+        if self.window_first == n:
+            self._window_drop(n)
+        self.first = n + 1
+
+    def _rebase(self, t):
+        self.t0 = t
+        self._n = 0
+        self._st = self._sv = self._stt = self._stv = 0.0
+        for n in range(self.window_first, self.next - 1):
+            slot = n % self.capacity
+            self._window_add(self.times[slot] - t, self.values[slot])
+
+    def _window_add(self, t, v):
+        self._n += 1
+        self._st += t
+        self._sv += v
+        self._stt += t * t
+        self._stv += t * v
+
+    def _window_drop(self, n):
+        slot = n % self.capacity
+        t = self.times[slot] - self.t0
+        v = self.values[slot]
+        self._n -= 1
+        self._st -= t
+        self._sv -= v
+        self._stt -= t * t
+        self._stv -= t * v
+        self.window_first = n + 1
+
+    @property
+    def latest(self):
+        return self.values[(self.next - 1) % self.capacity] if len(self) else None
+
+    @property
+    def min(self):
+        return self.values[self._min[0] % self.capacity] if self._min else None
+
+    @property
+    def max(self):
+        return self.values[self._max[0] % self.capacity] if self._max else None
+
+    @property
+    def mean(self):
+        return self.total / len(self) if len(self) else None
+
+    def window_span(self):
+        """Seconds covered by the rate-of-rise window"""
+        if self.next - self.window_first < 2:
+            return 0.0
+        return self.times[(self.next - 1) % self.capacity] - self.times[self.window_first % self.capacity]
+
+    def rate(self):
+        """Least-squares temperature slope over the window in °C per minute"""
+        n = self._n
+        if n < 2:
+            return 0.0
+        denominator = n * self._stt - self._st * self._st
+        if denominator <= 1e-9:
+            return 0.0
+        return (n * self._stv - self._st * self._sv) / denominator * 60.0
+
+    def ordered(self):
+        """Every buffered reading, oldest first, as one array"""
+        start = self.first % self.capacity
+        if start + len(self) <= self.capacity:
+            return self.values[start:start + len(self)]
+        return self.values[start:] + self.values[:self.next % self.capacity]
+
+    def downsample(self, points):
+        """Peak reading per bucket across the whole buffer, oldest first"""
+        values = self.ordered()
+        size = len(values)
+        if size <= points:
+            return list(values)
+        step = size / points
+        return [max(values[int(i * step):int((i + 1) * step)]) for i in range(points)]
+
+    def snapshot(self, points):
+        """Immutable copy of the statistics and sparkline view, safe to hand
+        to another thread while appends carry on"""
+        if not len(self):
+            return None
+        return TemperatureView(self.latest, self.min, self.max, self.mean, tuple(self.downsample(points)))
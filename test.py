@@ -1,35 +1,28 @@
 #!/usr/bin/env python3
-import serial
+import sys
 import time
 
+from port_discovery import CACHE_PATH, candidate_ports, discover
+
 print("=== Arduino Serial Port Finder ===\n")
 
-# Try common ports
-ports_to_try = [
-    '/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyUSB2',
-    '/dev/ttyACM0', '/dev/ttyACM1', '/dev/ttyACM2'
-]
+ports_to_try = candidate_ports()
+if not ports_to_try:
+    print("No /dev/ttyUSB* or /dev/ttyACM* ports found")
+    sys.exit(1)
+
+print(f"Probing {', '.join(ports_to_try)} in parallel...")
+
+start = time.time()
+roles = discover(rescan="--cached" not in sys.argv, on_line=lambda port, line: print(f"  {port} → {line}"))
+elapsed = time.time() - start
 
-for port in ports_to_try:
-    try:
-        print(f"Trying {port}...", end=" ")
-        ser = serial.Serial(port, 115200, timeout=2)
-        time.sleep(2)  # Wait for Arduino to reset
-        
-        # Read for 3 seconds
-        print("LISTENING...")
-        start = time.time()
-        while time.time() - start < 3:
-            if ser.in_waiting:
-                line = ser.readline().decode('utf-8', errors='ignore').strip()
-                print(f"  → {line}")
-        
-        ser.close()
-        print(f"✓ {port} is active\n")
-        
-    except serial.SerialException:
-        print("Not found")
-    except Exception as e:
-        print(f"Error: {e}")
+print()
+for role in ("UNO", "NANO_TEMP", "NANO_LED"):
+    if role in roles:
+        print(f"✓ {role:<9} on {roles[role]}")
+    else:
+        print(f"✗ {role:<9} not found")
 
-print("\n=== Done ===")
\ No newline at end of file
+print(f"\nPort map saved to {CACHE_PATH} ({elapsed:.1f}s)")
+print("\n=== Done ===")
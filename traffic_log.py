@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Record and replay raw serial traffic.
+
+Log layout (little-endian, append-only):
+
+    magic   b"ADLDLOG1"
+    records t_ns u64 | port u8 | kind u8 | length u16 | payload
+
+t_ns is time.monotonic_ns(). kind is IN/OUT for serial bytes, or NAME when
+a port ID is first used, whose payload is the port name. Inbound payloads
+are the exact bytes returned by each read, so noise and partial lines
+replay exactly as they arrived.
+
+Replay maps the file and runs every inbound record back through an
+engine's framing and process_*_message handlers at 1x, Nx or full speed.
+Captures from sections.py name their ports "<section>/<role>"; those
+replay into one engine per section on a shared multiplexer.
+
+Usage:
+    python3 traffic_log.py info capture.log
+    python3 traffic_log.py replay capture.log [--speed N | --fast]
+"""
+import argparse
+import mmap
+import struct
+import threading
+import time
+
+MAGIC = b"ADLDLOG1"
+RECORD = struct.Struct("<QBBH")
+MAX_PAYLOAD = 0xFFFF
+
+IN = 0
+OUT = 1
+NAME = 2
+
+
+class TrafficRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.port_ids = {}
+        self.lock = threading.Lock()
+
+    def _port_id(self, name):
+        # Caller holds the lock
+        port_id = self.port_ids.get(name)
+        if port_id is None:
+            port_id = len(self.port_ids)
+            self.port_ids[name] = port_id
+            encoded = name.encode()
+            self.file.write(RECORD.pack(time.monotonic_ns(), port_id, NAME, len(encoded)) + encoded)
+        return port_id
+
+    def record(self, name, kind, data):
+        t_ns = time.monotonic_ns()
+        with self.lock:
+            if self.file.closed:
+                return
+            port_id = self._port_id(name)
+            for start in range(0, len(data), MAX_PAYLOAD):
+                chunk = data[start:start + MAX_PAYLOAD]
+                self.file.write(RECORD.pack(t_ns, port_id, kind, len(chunk)) + chunk)
+
+    def inbound(self, name, data):
+        self.record(name, IN, data)
+
+    def outbound(self, name, data):
+        self.record(name, OUT, data)
+
+    def flush(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class TrafficLog:
+    """Memory-mapped reader; iterating yields (t_ns, port name, kind, payload)"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.map.close()
+            raise ValueError(f"{path}: not a traffic log")
+
+    def __iter__(self):
+        buf = self.map
+        unpack = RECORD.unpack_from
+        header = RECORD.size
+        names = {}
+        offset = len(MAGIC)
+        end = len(buf)
+        while offset + header <= end:
+            t_ns, port_id, kind, length = unpack(buf, offset)
+            offset += header
+            if offset + length > end:
+                # Torn final record from a crash mid-write
+                break
+            payload = buf[offset:offset + length]
+            offset += length
+            if kind == NAME:
+                names[port_id] = payload.decode()
+                continue
+            yield t_ns, names.get(port_id, str(port_id)), kind, payload
+
+    def close(self):
+        self.map.close()
+
+
+def replay(path, engines, speed=1.0):
+    """Feed every inbound record through the framing and handlers of the
+    engine whose names table has its port.
+
+    engines is one engine, or a list of engines sharing a serial_mux (one
+    per section). speed is a multiple of real time; 0 means as fast as
+    possible. Returns (records replayed, bytes replayed, wall seconds).
+    """
+    if not isinstance(engines, (list, tuple)):
+        engines = [engines]
+    mux = engines[0].serial_mux
+    handlers = {}
+    owners = {}
+    for engine in engines:
+        for role, handler in (("UNO", engine.process_uno_message),
+                              ("NANO_TEMP", engine.process_nano_temp_message),
+                              ("NANO_LED", engine.process_nano_led_message)):
+            handlers[engine.names[role]] = handler
+            owners[engine.names[role]] = (engine, role)
+    log = TrafficLog(path)
+    records = 0
+    total = 0
+    first = None
+    start = time.perf_counter()
+    try:
+        for t_ns, name, kind, payload in log:
+            if kind != IN:
+                continue
+            if name not in mux.channels:
+                mux.add_virtual(name, handlers.get(name, lambda frame: None))
+                # Live sessions may have switched to binary frames
+                if name in owners:
+                    engine, role = owners[name]
+                    if engine.negotiate_binary:
+                        engine.expect_binary(role)
+            if speed:
+                if first is None:
+                    first = t_ns
+                delay = (t_ns - first) / 1e9 / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            mux.inject(name, payload)
+            records += 1
+            total += len(payload)
+    finally:
+        log.close()
+    return records, total, time.perf_counter() - start
+
+
+def sections(path):
+    """Section names used by the ports in a capture, in first-seen order"""
+    log = TrafficLog(path)
+    found = {}
+    try:
+        for _, name, _, _ in log:
+            if "/" in name:
+                found.setdefault(name.rsplit("/", 1)[0], None)
+    finally:
+        log.close()
+    return list(found)
+
+
+def info(path):
+    log = TrafficLog(path)
+    stats = {}
+    first = last = None
+    try:
+        for t_ns, name, kind, payload in log:
+            first = t_ns if first is None else first
+            last = t_ns
+            entry = stats.setdefault((name, kind), [0, 0])
+            entry[0] += 1
+            entry[1] += len(payload)
+    finally:
+        log.close()
+
+    span = (last - first) / 1e9 if first is not None else 0.0
+    print(f"{path}: {span:.1f}s captured")
+    for (name, kind), (count, size) in sorted(stats.items()):
+        direction = "in " if kind == IN else "out"
+        print(f"  {name:<10} {direction} {count:8d} records {size:10d} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay a serial traffic log")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_info = sub.add_parser("info")
+    p_info.add_argument("log")
+    p_replay = sub.add_parser("replay")
+    p_replay.add_argument("log")
+    p_replay.add_argument("--speed", type=float, default=1.0, help="multiple of real time (default 1)")
+    p_replay.add_argument("--fast", action="store_true", help="replay as fast as possible")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        info(args.log)
+        return
+
+    from engine import AxleCounterEngine
+    names = sections(args.log)
+    if names:
+        from aio_serial import AsyncSerialMultiplexer
+        mux = AsyncSerialMultiplexer()
+        engines = [AxleCounterEngine(section=name, serial_mux=mux, discover_missing=False) for name in names]
+    else:
+        engines = [AxleCounterEngine()]
+    records, total, elapsed = replay(args.log, engines, 0 if args.fast else args.speed)
+    print(f"Replayed {records} records ({total} bytes) in {elapsed:.3f}s")
+    for name, engine in zip(names or [None], engines):
+        print(f"Final state{f' ({name})' if name else ''}: {engine.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()